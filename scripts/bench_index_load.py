@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for loading the theme index.
+
+Times how long it takes to turn an index body into Theme objects the way a
+cold start does (JSON parse) and the way a warm start does (binary snapshot),
+including hashing the body in both cases.
+
+Usage: scripts/bench_index_load.py [INDEX_JSON] [--themes N] [--runs N]
+
+Without INDEX_JSON a synthetic index of --themes entries is used. The
+snapshot is written to a temporary cache, never to ~/.grubdeck.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import theme_fetcher
+from cache_manager import CacheManager
+
+BENCH_URL = "bench://index.json"
+
+
+def synthetic_index(count):
+    themes = []
+    for i in range(count):
+        base = f"https://raw.githubusercontent.com/example/theme-{i}/main"
+        themes.append({
+            "id": i,
+            "name": f"Theme {i}",
+            "cover_image": f"{base}/preview/1.png",
+            "description": f"A GRUB theme with rounded menus and large fonts, variant {i}",
+            "carousel_images": [f"{base}/preview/{n}.png" for n in range(1, 5)],
+            "size_options": [{"name": name, "repo_link": f"https://github.com/example/theme-{i}",
+                              "branch_name": branch} for name, branch in (("1080p", "main"), ("2K", "2k"))],
+            "created_by": {"name": f"author-{i % 97}"},
+        })
+    return json.dumps(themes).encode('utf-8')
+
+
+def load_json(data):
+    hashlib.sha256(data).hexdigest()
+    return [theme for batch in theme_fetcher.iter_theme_batches(data.decode('utf-8')) for theme in batch]
+
+
+def load_snapshot(data):
+    return theme_fetcher.read_index_snapshot(BENCH_URL, hashlib.sha256(data).hexdigest())
+
+
+def best_of(runs, fn, data):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        themes = fn(data)
+        timings.append(time.perf_counter() - start)
+    return themes, min(timings), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold (JSON) vs warm (snapshot) index loading.")
+    parser.add_argument("index", nargs="?", help="index JSON file (default: synthetic)")
+    parser.add_argument("--themes", type=int, default=5000, help="size of the synthetic index")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.index:
+        with open(args.index, 'rb') as f:
+            data = f.read()
+    else:
+        data = synthetic_index(args.themes)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        theme_fetcher.cache = CacheManager(cache_dir, sweep_interval=0)
+
+        themes, json_best, json_median = best_of(args.runs, load_json, data)
+        theme_fetcher.write_index_snapshot(BENCH_URL, hashlib.sha256(data).hexdigest(), themes)
+        restored, snap_best, snap_median = best_of(args.runs, load_snapshot, data)
+
+        if restored is None or [t.to_row() for t in restored] != [t.to_row() for t in themes]:
+            print("Snapshot did not round-trip the index", file=sys.stderr)
+            return 1
+
+    print(f"{len(themes)} themes, {len(data) / 1024:.0f} KiB of JSON")
+    print(f"  JSON parse      best {json_best * 1000:8.1f} ms   median {json_median * 1000:8.1f} ms")
+    print(f"  snapshot load   best {snap_best * 1000:8.1f} ms   median {snap_median * 1000:8.1f} ms")
+    print(f"  speedup         {json_median / snap_median:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
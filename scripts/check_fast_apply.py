@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Check grub_config.fast_apply against the generated configs in grub_fixtures/.
+
+Each fixture is copied into a temporary tree standing in for a root (or /boot)
+filesystem with two installed themes, Old and New, and fast_apply is asked to
+switch it to New:
+
+    valid.cfg          theme block for Old                 -> updated
+    separate_boot.cfg  same, /boot on its own partition    -> updated
+    current.cfg        already New                         -> unchanged
+    no_block.cfg       no theme block (GRUB_THEME unset)   -> None
+    two_themes.cfg     a second `set theme` in 41_custom   -> None
+    btrfs_subvol.cfg   path inside a btrfs subvolume       -> None
+
+An update must change nothing outside the theme block and produce the same
+file grub_fixtures/grub-mkconfig (a stub of grub-mkconfig) writes for New; a
+None must leave the file untouched. Finally the installer itself is run
+against the stub for the fallback, the fast path and a failing mkconfig.
+
+Usage: scripts/check_fast_apply.py     (exits 1 if a check fails)
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(SCRIPTS_DIR, "grub_fixtures")
+STUB_MKCONFIG = os.path.join(FIXTURES_DIR, "grub-mkconfig")
+SRC_DIR = os.path.join(SCRIPTS_DIR, "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from grub_config import GeneratedGrubConfig, fast_apply
+
+# (fixture, theme GRUB_THEME pointed at before, mount point the paths in the fixture are relative to, expected)
+CASES = [
+    ("valid.cfg", "Old", "", "updated"),
+    ("separate_boot.cfg", "Old", "/boot", "updated"),
+    ("current.cfg", "New", "", "unchanged"),
+    ("no_block.cfg", None, "", None),
+    ("two_themes.cfg", "Old", "", None),
+    ("btrfs_subvol.cfg", "Old", "", None),
+]
+
+THEME_FILES = {
+    "Old": ["theme.txt", "dejavu_sans_16.pf2", "background.png"],
+    "New": ["theme.txt", "dejavu_sans_12.pf2", "terminus_14.pf2", "f/unifont_16.pf2",
+            "background.jpg", "select_c.png"],
+}
+
+
+def make_root(root):
+    for theme, files in THEME_FILES.items():
+        for name in files:
+            path = os.path.join(root, "boot", "grub", "themes", theme, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(f"{theme} {name}\n")
+
+
+def theme_file(root, theme):
+    return os.path.join(root, "boot", "grub", "themes", theme, "theme.txt")
+
+
+def stub_mkconfig(root, mount, theme, cfg_path, **env):
+    default = os.path.join(root, "default-grub")
+    with open(default, "w") as f:
+        f.write(f'GRUB_THEME="{theme_file(root, theme)}"\n')
+    subprocess.run([STUB_MKCONFIG, "-o", cfg_path], check=True,
+                   env=dict(os.environ, GRUBDECK_GRUB_DEFAULT=default, GRUBDECK_STUB_ROOT=root + mount, **env))
+
+
+def check_case(fixture, previous, mount, expected):
+    failures = []
+    with tempfile.TemporaryDirectory() as root:
+        make_root(root)
+        cfg_path = os.path.join(root, "grub.cfg")
+        shutil.copy(os.path.join(FIXTURES_DIR, fixture), cfg_path)
+        with open(cfg_path) as f:
+            before = f.read()
+
+        previous_theme = theme_file(root, previous) if previous else None
+        result = fast_apply(cfg_path, theme_file(root, "New"), previous_theme)
+        with open(cfg_path) as f:
+            after = f.read()
+
+        if result != expected:
+            failures.append(f"returned {result!r}, expected {expected!r}")
+        if result != "updated" and after != before:
+            failures.append("file changed although nothing was applied")
+        if result == "updated":
+            old, new = GeneratedGrubConfig(before), GeneratedGrubConfig(after)
+            if not new.valid or root + mount + new.theme_path != theme_file(root, "New"):
+                failures.append(f"result does not point at New: {new.theme_path!r}")
+            if old.lines[:old.block[0]] != new.lines[:new.block[0]] or \
+                    old.lines[old.block[1]:] != new.lines[new.block[1]:]:
+                failures.append("lines outside the theme block changed")
+        if result in ("updated", "unchanged") and fixture in ("valid.cfg", "current.cfg"):
+            regenerated = os.path.join(root, "regenerated.cfg")
+            stub_mkconfig(root, mount, "New", regenerated)
+            with open(regenerated) as f:
+                if f.read() != after:
+                    failures.append("differs from what the stub grub-mkconfig writes")
+    return failures
+
+
+def check_installer():
+    """Run privileged_installer.py's GRUB steps against the stub, as the current (non-root) user."""
+    failures = []
+    with tempfile.TemporaryDirectory() as root:
+        make_root(root)
+        cfg_path = os.path.join(root, "grub.cfg")
+        default = os.path.join(root, "default-grub")
+        log = os.path.join(root, "stub.log")
+        with open(default, "w") as f:
+            f.write('GRUB_TIMEOUT=5\nGRUB_CMDLINE_LINUX_DEFAULT="quiet"\n')
+        env = dict(os.environ, GRUBDECK_GRUB_DEFAULT=default, GRUBDECK_STUB_ROOT=root, GRUBDECK_STUB_LOG=log,
+                   GRUBDECK_THEMES_DIR=os.path.join(root, "boot", "grub", "themes"),
+                   GRUBDECK_GRUB_MKCONFIG=f"{STUB_MKCONFIG} -o {cfg_path}")
+        code = ("import sys; sys.path.insert(0, sys.argv[1]); import privileged_installer as p; "
+                "p.activate_theme(sys.argv[2], lambda percentage, message: None)")
+
+        def activate(theme, **extra):
+            return subprocess.run([sys.executable, "-c", code, SRC_DIR, theme],
+                                  env=dict(env, **extra), capture_output=True, text=True)
+
+        def runs():
+            return len(open(log).readlines()) if os.path.exists(log) else 0
+
+        # No theme block yet: full regeneration
+        if activate("Old").returncode != 0 or runs() != 1:
+            failures.append("first activation did not regenerate grub.cfg")
+        # Block present: switched in place, no mkconfig run
+        if activate("New").returncode != 0 or runs() != 1:
+            failures.append("switching themes ran mkconfig")
+        # Same theme again: nothing to do
+        if activate("New").returncode != 0 or runs() != 1:
+            failures.append("re-activating the same theme ran mkconfig")
+        if GeneratedGrubConfig(open(cfg_path).read()).theme_path != "/boot/grub/themes/New/theme.txt":
+            failures.append("grub.cfg does not point at New")
+        # Unrecognised block and a failing mkconfig: the error surfaces as CalledProcessError
+        with open(cfg_path, "a") as f:
+            f.write("set theme=($root)/elsewhere/theme.txt\n")
+        result = activate("Old", GRUBDECK_STUB_FAIL="1")
+        if runs() != 2 or "CalledProcessError" not in result.stderr:
+            failures.append("a failing mkconfig was not reported")
+    return failures
+
+
+def main():
+    failed = False
+    for fixture, previous, mount, expected in CASES:
+        failures = check_case(fixture, previous, mount, expected)
+        print(f"{'FAIL' if failures else 'ok  '}  {fixture:<18} {expected!r}")
+        for failure in failures:
+            print(f"        {failure}")
+        failed = failed or bool(failures)
+
+    if os.geteuid() == 0:
+        print("skip  installer          (the installer ignores test overrides as root)")
+    else:
+        failures = check_installer()
+        print(f"{'FAIL' if failures else 'ok  '}  installer")
+        for failure in failures:
+            print(f"        {failure}")
+        failed = failed or bool(failures)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,378 @@
 import os
+import sys
+import json
+import marshal
 import time
+import atexit
 import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from constants import (CACHE_MAX_BYTES, CACHE_DEFAULT_TTL, CACHE_SWEEP_INTERVAL, CACHE_STALE_GRACE,
+                       CACHE_FLUSH_DELAY)
 
 class CacheManager:
-    """A file-based caching system with Time-To-Live (TTL) expiration."""
-    def __init__(self):
-        self.cache_dir = os.path.expanduser("~/.grubdeck/cache")
-        os.makedirs(self.cache_dir, exist_ok=True)
+    """
+    A file-based caching system with Time-To-Live (TTL) expiration.
 
-    def _get_path(self, url):
+    An index of every entry (size, write time, last access, expiry) is kept in
+    memory and mirrored to index.json, so lookups never stat the disk. The
+    index is saved shortly after entries are written or evicted, and checked
+    against the directory on load in case the last run died before saving it.
+    The cache is held under max_bytes by evicting the least recently used
+    entries, and a background sweep deletes entries once they expire.
+
+    Entries may also carry the HTTP validators (ETag / Last-Modified) of the
+    response they came from. Those are kept for CACHE_STALE_GRACE past expiry
+    so a stale copy can be revalidated with a conditional request instead of
+    being downloaded again. So are entries written with keep_stale or served
+    by get_stale(), whose stale copy is worth having offline either way.
+    """
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir=None, max_bytes=CACHE_MAX_BYTES, sweep_interval=CACHE_SWEEP_INTERVAL,
+                 flush_delay=CACHE_FLUSH_DELAY):
+        self.cache_dir = cache_dir or os.path.expanduser("~/.grubdeck/cache")
+        self.max_bytes = max_bytes
+        self.flush_delay = flush_delay
+        # The directory is only created once something is written to it
+        self._dir_ready = False
+
+        self._lock = threading.RLock()
+        # Serialises writers of index.json
+        self._flush_lock = threading.Lock()
+        self._flush_timer = None
+        # Least recently used first
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._dirty = False
+        self._load_index()
+
+        self._stop_sweep = threading.Event()
+        if sweep_interval:
+            threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                             name="cache-sweep", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _get_key(self, url):
         # Hash the URL to create a safe, unique filename
-        url_hash = hashlib.md5(url.encode('utf-8')).hexdigest()
-        return os.path.join(self.cache_dir, url_hash)
+        return hashlib.md5(url.encode('utf-8')).hexdigest()
+
+    def _get_path(self, url):
+        return os.path.join(self.cache_dir, self._get_key(url))
 
     def get(self, url, max_age_seconds):
         """Retrieve data from cache if it exists and hasn't expired."""
-        path = self._get_path(url)
-        if os.path.exists(path):
-            # Check if the file is younger than the max_age_seconds
-            if time.time() - os.path.getmtime(path) < max_age_seconds:
-                try:
-                    with open(path, 'rb') as f:
-                        return f.read()
-                except Exception:
-                    pass
-        return None
+        path = self.get_path(url, max_age_seconds)
+        return self._read(self._get_key(url)) if path else None
+
+    def get_path(self, url, max_age_seconds):
+        """Return the file holding a fresh copy of url, or None."""
+        key = self._get_key(url)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._is_fresh(entry, now, max_age_seconds):
+                return None
+            self._touch(key, entry, now)
+        return os.path.join(self.cache_dir, key)
 
-    def set(self, url, data):
-        """Write raw bytes to the cache."""
-        path = self._get_path(url)
+    def get_stale(self, url, max_age_seconds):
+        """Retrieve data from cache even if expired; returns (data, is_fresh)."""
+        key = self._get_key(url)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            fresh = self._is_fresh(entry, now, max_age_seconds)
+            entry["keep_stale"] = True
+            self._touch(key, entry, now)
+        return self._read(key), fresh
+
+    def set(self, url, data, max_age_seconds=CACHE_DEFAULT_TTL, validators=None):
+        """Write raw bytes to the cache, keeping them for at most max_age_seconds."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
         try:
-            with open(path, 'wb') as f:
-                if isinstance(data, str):
-                    f.write(data.encode('utf-8'))
-                else:
-                    f.write(data)
+            self.set_stream(url, [data], max_age_seconds, validators)
         except Exception:
             pass
+
+    def set_stream(self, url, chunks, max_age_seconds=CACHE_DEFAULT_TTL, validators=None,
+                   max_size=None, progress=None, keep_stale=False):
+        """
+        Write an iterable of byte chunks to the cache and return the entry's path.
+
+        Chunks go to a temporary file in the cache directory that is renamed into
+        place only once complete, so an interrupted or oversized download
+        (past max_size bytes, raising ValueError) never leaves a partial entry.
+        progress, if given, is called with the number of bytes written so far.
+        keep_stale (also inherited from the entry being replaced) keeps the copy
+        for CACHE_STALE_GRACE past expiry, as for entries with validators.
+        """
+        key = self._get_key(url)
+        path = os.path.join(self.cache_dir, key)
+        if not self._dir_ready:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._dir_ready = True
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise ValueError(f"Resource exceeds the {max_size} byte limit: {url}")
+                    f.write(chunk)
+                    if progress:
+                        progress(size)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        now = time.time()
+        # The file is put in place and registered in one step: a concurrent
+        # _remove() of the old entry must not delete the new file
+        with self._lock:
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old["size"]
+            entry = {"size": size, "stored": now, "accessed": now,
+                     "expires": now + max_age_seconds}
+            if keep_stale or (old is not None and old.get("keep_stale")):
+                entry["keep_stale"] = True
+            if validators:
+                entry.update((k, v) for k, v in validators.items() if k in ("etag", "last_modified") and v)
+            self._entries[key] = entry
+            self._total_bytes += size
+            self._dirty = True
+            self._evict(keep=key)
+            self._schedule_flush()
+        return path
+
+    def invalidate(self, url, only_if_missing=False):
+        """Drop the cached copy of url, if any (with only_if_missing, only if its file is gone)."""
+        self._remove(self._get_key(url), only_if_missing=only_if_missing)
+
+    def get_snapshot(self, name, schema, content_hash):
+        """
+        Return the object stored by set_snapshot() under name, or None.
+
+        A snapshot only counts if it was made from the same content (by hash),
+        with the same schema version and by the same Python (marshal) version;
+        anything else, including a damaged file, is treated as missing.
+        """
+        path = self.get_path(name, CACHE_DEFAULT_TTL)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                if f.readline() != self._snapshot_header(schema, content_hash):
+                    return None
+                return marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            self.invalidate(name)
+            return None
+
+    def set_snapshot(self, name, schema, content_hash, payload):
+        """Store a marshal-able object derived from content with the given hash."""
+        try:
+            self.set_stream(name, [self._snapshot_header(schema, content_hash), marshal.dumps(payload)])
+        except (OSError, ValueError) as e:
+            print(f"Failed to write snapshot {name}: {e}")
+
+    @staticmethod
+    def _snapshot_header(schema, content_hash):
+        return (f"grubdeck-snapshot {schema} {marshal.version} "
+                f"{sys.version_info[0]}.{sys.version_info[1]} {content_hash}\n").encode('ascii')
+
+    def conditional_headers(self, url):
+        """Return If-None-Match / If-Modified-Since headers for a cached copy of url."""
+        with self._lock:
+            entry = self._entries.get(self._get_key(url))
+            if entry is None:
+                return {}
+            headers = {}
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            return headers
+
+    def revalidated(self, url, max_age_seconds):
+        """Mark a stale entry fresh again (after a 304) and return its path."""
+        key = self._get_key(url)
+        now = time.time()
+        path = os.path.join(self.cache_dir, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(path):
+                self._remove(key)
+                return None
+            entry.update(stored=now, expires=now + max_age_seconds)
+            self._touch(key, entry, now)
+        return path
+
+    def sweep(self):
+        """Delete expired entries and persist the index."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if self._removable_at(entry) <= now]
+        for key in expired:
+            # Re-checked under the lock: the entry may have been rewritten since
+            self._remove(key, expired_by=now)
+        self.flush()
+
+    def flush(self):
+        """Write the in-memory index to disk if it changed."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = json.dumps({"version": 1, "entries": self._entries})
+                self._dirty = False
+            index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+            tmp_path = f"{index_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, index_path)
+            except OSError:
+                pass
+
+    def _schedule_flush(self):
+        # Caller holds the lock. Writes and evictions are saved after
+        # flush_delay, batched, so a crash loses at most that much of the index
+        if self.flush_delay and self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self._delayed_flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _delayed_flush(self):
+        with self._lock:
+            self._flush_timer = None
+        self.flush()
+
+    @staticmethod
+    def _is_fresh(entry, now, max_age_seconds):
+        return now < entry["expires"] and now - entry["stored"] < max_age_seconds
+
+    def _touch(self, key, entry, now):
+        # Caller holds the lock
+        entry["accessed"] = now
+        self._entries.move_to_end(key)
+        self._dirty = True
+
+    @staticmethod
+    def _removable_at(entry):
+        # Entries that can be revalidated, or are wanted stale, outlive their expiry by the grace period
+        if "etag" in entry or "last_modified" in entry or entry.get("keep_stale"):
+            return entry["expires"] + CACHE_STALE_GRACE
+        return entry["expires"]
+
+    def _read(self, key):
+        try:
+            with open(os.path.join(self.cache_dir, key), 'rb') as f:
+                return f.read()
+        except OSError:
+            # The file vanished behind our back; forget it
+            self._remove(key, only_if_missing=True)
+            return None
+
+    def _evict(self, keep=None):
+        # Caller holds the lock; never evicts `keep`, the entry just written
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self._remove(key)
+
+    def _remove(self, key, expired_by=None, only_if_missing=False):
+        # The entry and its file go together under the lock, so a set_stream()
+        # of the same key never has its new file deleted. With expired_by, only
+        # an entry still removable at that time goes; with only_if_missing, only
+        # one whose file is gone
+        path = os.path.join(self.cache_dir, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if expired_by is not None and self._removable_at(entry) > expired_by:
+                return
+            if only_if_missing and os.path.exists(path):
+                return
+            del self._entries[key]
+            self._total_bytes -= entry["size"]
+            self._dirty = True
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._schedule_flush()
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE)) as f:
+                data = json.load(f)
+            entries = data["entries"] if data.get("version") == 1 else None
+        except (OSError, ValueError, KeyError, AttributeError):
+            entries = None
+
+        # The index may be older than the directory (the last run died before
+        # saving it): forget entries whose file is gone and adopt files it lacks
+        indexed = entries or {}
+        names = self._list_cache_dir()
+        entries = {key: entry for key, entry in indexed.items() if key in names}
+        self._dirty = len(entries) != len(indexed)
+        for name in names - entries.keys():
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries[name] = {"size": st.st_size, "stored": st.st_mtime, "accessed": st.st_mtime,
+                             "expires": st.st_mtime + CACHE_DEFAULT_TTL}
+            self._dirty = True
+
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]["accessed"]):
+            self._entries[key] = entry
+            self._total_bytes += entry["size"]
+        self._evict()
+
+    def _list_cache_dir(self):
+        # Names of the cache's entry files; leftover partial downloads are deleted
+        try:
+            listing = os.listdir(self.cache_dir)
+        except OSError:
+            return set()
+        names = set()
+        for name in listing:
+            if name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+            elif name != self.INDEX_FILE:
+                names.add(name)
+        return names
+
+    def _sweep_loop(self, interval):
+        while not self._stop_sweep.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Cache sweep failed: {e}")
@@ -5,6 +5,15 @@ WINDOW_TITLE = "Grub Deck - Modern GRUB Theme Manager"
 WINDOW_WIDTH = 1200
 WINDOW_HEIGHT = 800
 
+# Theme grid card geometry
+CARD_WIDTH = 280
+CARD_HEIGHT = 240
+CARD_IMAGE_HEIGHT = 160
+CARD_SPACING = 25
+
+# Delay after the last keystroke before a search runs
+SEARCH_DEBOUNCE_MS = 150
+
 PROGRESS_DIALOG_WIDTH = 400
 PROGRESS_DIALOG_HEIGHT = 150
 
@@ -12,9 +21,70 @@ PROGRESS_DIALOG_HEIGHT = 150
 # This URL points to the correct JSON index file in the GitHub repository
 THEME_INDEX_URL = os.environ.get("GRUBDECK_INDEX_URL") or "https://raw.githubusercontent.com/abinopoulose/grubdeck-index/refs/heads/main/index.json"
 
+# The index is parsed and handed to the grid in batches: a small first one
+# (about a screen of cards) so the grid fills quickly, then larger ones
+THEME_FIRST_BATCH = 48
+THEME_BATCH_SIZE = 512
+
+# Shards of a sharded index are pinned by the manifest's hash, so they can be
+# kept far longer than the index itself (30 days)
+INDEX_SHARD_TTL = 2592000
+
+# Local cache (~/.grubdeck/cache)
+# Upper bound on the cache size; least recently used entries are evicted past it
+CACHE_MAX_BYTES = int(os.environ.get("GRUBDECK_CACHE_MAX_MB") or 256) * 1024 * 1024
+# Lifetime of an entry when the writer does not give one (7 days)
+CACHE_DEFAULT_TTL = 604800
+# How long expired entries with HTTP validators are kept around for revalidation (30 days)
+CACHE_STALE_GRACE = 2592000
+# How often expired entries are swept from disk
+CACHE_SWEEP_INTERVAL = 600
+# Seconds after an entry is written or evicted before the index is saved
+CACHE_FLUSH_DELAY = 5
+
+# Image fetching
+# Number of worker threads shared by every cover/carousel download
+IMAGE_FETCH_WORKERS = int(os.environ.get("GRUBDECK_FETCH_WORKERS") or 6)
+
+# Memory budget for decoded images kept for the grid and the carousel
+IMAGE_MEMORY_CACHE_MB = int(os.environ.get("GRUBDECK_IMAGE_MEMORY_MB") or 128)
+
+# HTTP client shared by every fetcher
+# (connect, read) timeouts in seconds
+HTTP_TIMEOUT = (5, 15)
+# Keep-alive connections kept per host; also caps concurrent requests to one host
+HTTP_CONNECTIONS_PER_HOST = IMAGE_FETCH_WORKERS + 2
+# Number of distinct hosts whose connection pools are kept
+HTTP_MAX_HOSTS = 8
+
+# Downloads are streamed to the cache in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Largest resources accepted from the network
+MAX_INDEX_BYTES = 64 * 1024 * 1024
+MAX_IMAGE_BYTES = 32 * 1024 * 1024
+
+# Seconds before a cover that failed to load is requested again
+COVER_RETRY_INTERVAL = 30
+
+# Fetch priorities (lower runs first)
+PRIORITY_PREVIEW = -10
+PRIORITY_VISIBLE = 0
+PRIORITY_OFFSCREEN = 10
+PRIORITY_PREFETCH = 20
+
+# Predictive prefetch of preview screenshots (on hover, and for visible themes when idle)
+PREFETCH_MAX_IN_FLIGHT = 2
+PREFETCH_MAX_QUEUED = 24
+PREFETCH_SLIDES_PER_THEME = 3
+PREFETCH_IDLE_MS = 2000
+PREFETCH_IDLE_THEMES = 4
+
 # GRUB configuration paths (for installer script)
 GRUB_CONFIG_PATH = "/etc/default/grub"
 GRUB_THEMES_DIR = "/boot/grub/themes"
+# Keep one privileged helper running for the session instead of a pkexec
+# prompt per install (it exits after 10 idle minutes)
+USE_PRIVILEGED_HELPER = os.environ.get("GRUBDECK_PRIVILEGED_HELPER", "") not in ("", "0")
 
 # Error messages
 ERROR_NO_THEMES = "No themes found. Please check your internet connection."
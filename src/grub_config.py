@@ -0,0 +1,210 @@
+import os
+import re
+import glob
+import tempfile
+
+# Runs inside the privileged installer: standard library only.
+
+_SECTION_BEGIN_RE = re.compile(r"^### BEGIN (\S+) ###$")
+_SECTION_END_RE = re.compile(r"^### END (\S+) ###$")
+_SET_THEME_RE = re.compile(r"^(\s*)set theme=\(\$root\)(\S+)\s*$")
+_THEME_PREAMBLE_RE = re.compile(r"^\s*(?:insmod (?:jpeg|png|tga)|loadfont \(\$root\)\S+)\s*$")
+
+
+def read_grub_theme(default_path):
+    """Return the GRUB_THEME value in /etc/default/grub, or None if it is not set."""
+    with open(default_path) as f:
+        for line in f:
+            if line.startswith("GRUB_THEME="):
+                value = line.split("=", 1)[1].strip()
+                if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+                    value = value[1:-1]
+                return value
+    return None
+
+
+def set_grub_theme(default_path, theme_path):
+    """Point GRUB_THEME at theme_path; returns False if it already did."""
+    with open(default_path) as f:
+        lines = f.readlines()
+    wanted = f'GRUB_THEME="{theme_path}"\n'
+    updated = [wanted if line.startswith("GRUB_THEME=") else line for line in lines]
+    # Add GRUB_THEME if it wasn't found
+    if not any(line.startswith("GRUB_THEME=") for line in lines):
+        if updated and not updated[-1].endswith("\n"):
+            updated[-1] += "\n"
+        updated.append(wanted)
+    if updated == lines:
+        return False
+    write_atomically(default_path, "".join(updated))
+    return True
+
+
+class GeneratedGrubConfig:
+    """
+    grub.cfg as written by grub-mkconfig, parsed far enough to edit its theme.
+
+    The file is split into the /etc/grub.d scripts that produced it, and the
+    theme block emitted by 00_header is located:
+
+        insmod gfxmenu
+        loadfont ($root)<theme dir>/<font>.pf2     (one per font)
+        insmod png                                 (jpeg / tga, by image types)
+        set theme=($root)<theme path>
+        export theme
+
+    `valid` is only True when there is exactly one such block, inside
+    00_header, and nothing else in the file sets a theme.
+    """
+
+    def __init__(self, text):
+        self.lines = text.splitlines(keepends=True)
+        self.sections = {}
+        self.block = None
+        self.theme_path = None
+        self.indent = ""
+        self.valid = False
+        self._parse()
+
+    def _parse(self):
+        current, start = None, 0
+        for number, line in enumerate(self.lines):
+            stripped = line.rstrip("\n")
+            begin = _SECTION_BEGIN_RE.match(stripped)
+            end = _SECTION_END_RE.match(stripped)
+            if begin:
+                current, start = begin.group(1), number
+            elif end and end.group(1) == current:
+                self.sections[current] = (start, number + 1)
+                current = None
+
+        theme_lines = [n for n, line in enumerate(self.lines) if re.match(r"^\s*set theme=", line)]
+        if len(theme_lines) != 1:
+            return
+        number = theme_lines[0]
+        match = _SET_THEME_RE.match(self.lines[number])
+        header = self.sections.get("/etc/grub.d/00_header")
+        if not match or header is None or not header[0] < number < header[1]:
+            return
+        if number + 1 >= len(self.lines) or self.lines[number + 1].strip() != "export theme":
+            return
+
+        first = number - 1
+        while first > header[0] and _THEME_PREAMBLE_RE.match(self.lines[first]):
+            first -= 1
+        if self.lines[first].strip() != "insmod gfxmenu":
+            return
+
+        self.block = (first, number + 2)
+        self.indent = match.group(1)
+        self.theme_path = match.group(2)
+        self.valid = True
+
+    def with_theme_block(self, block_lines):
+        """Return the file's text with the theme block replaced by block_lines."""
+        first, end = self.block
+        return "".join(self.lines[:first] + block_lines + self.lines[end:])
+
+
+def render_theme_block(indent, theme_file, root_prefix):
+    """
+    Build the lines 00_header would emit for theme_file.
+
+    root_prefix is the part of the path GRUB does not see, because it is the
+    mount point of the partition GRUB reads it from ("/boot" when /boot is its
+    own partition, "" otherwise).
+    """
+    theme_dir = os.path.dirname(theme_file)
+
+    def grub_path(path):
+        return "($root)" + path[len(root_prefix):]
+
+    lines = ["insmod gfxmenu"]
+    for font in sorted(glob.glob(os.path.join(theme_dir, "*.pf2"))) + \
+            sorted(glob.glob(os.path.join(theme_dir, "f", "*.pf2"))):
+        if os.path.isfile(font):
+            lines.append(f"loadfont {grub_path(font)}")
+    if glob.glob(os.path.join(theme_dir, "*.jpg")) or glob.glob(os.path.join(theme_dir, "*.jpeg")):
+        lines.append("insmod jpeg")
+    if glob.glob(os.path.join(theme_dir, "*.png")):
+        lines.append("insmod png")
+    if glob.glob(os.path.join(theme_dir, "*.tga")):
+        lines.append("insmod tga")
+    lines.append(f"set theme={grub_path(theme_file)}")
+    lines.append("export theme")
+    return [f"{indent}{line}\n" for line in lines]
+
+
+def fast_apply(cfg_path, theme_file, previous_theme):
+    """
+    Switch the generated grub.cfg to theme_file without running grub-mkconfig.
+
+    Only done when the existing theme block can be trusted to differ from the
+    regenerated one in nothing but the theme itself: it was generated for
+    previous_theme, and the new theme is on the same filesystem, so the device
+    lines before the block still hold. Returns "unchanged" if the file already
+    matched, "updated" after rewriting it, or None when a full regeneration is
+    needed.
+    """
+    try:
+        with open(cfg_path) as f:
+            text = f.read()
+    except OSError:
+        return None
+
+    config = GeneratedGrubConfig(text)
+    if not config.valid or not previous_theme or not os.path.isfile(theme_file):
+        return None
+    # The block's path is previous_theme as GRUB sees it, minus the partition's mount point
+    if not previous_theme.endswith(config.theme_path):
+        return None
+    root_prefix = previous_theme[:len(previous_theme) - len(config.theme_path)]
+    if root_prefix and not theme_file.startswith(root_prefix + "/"):
+        return None
+    if _device_of(previous_theme) != _device_of(theme_file):
+        return None
+
+    new_text = config.with_theme_block(render_theme_block(config.indent, theme_file, root_prefix))
+    if new_text == text:
+        return "unchanged"
+
+    # Re-parse the result so nothing but a well-formed block for the new theme is ever written
+    check = GeneratedGrubConfig(new_text)
+    if not check.valid or root_prefix + check.theme_path != theme_file:
+        return None
+    write_atomically(cfg_path, new_text)
+    return "updated"
+
+
+def write_atomically(path, text):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".grubdeck-", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except OSError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _device_of(path):
+    # Device of the nearest existing ancestor (the previous theme may be gone)
+    while path and not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    try:
+        return os.stat(path or "/").st_dev
+    except OSError:
+        return None
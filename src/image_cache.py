@@ -0,0 +1,23 @@
+from PyQt6.QtGui import QPixmapCache
+from constants import IMAGE_MEMORY_CACHE_MB
+
+# Decoded images shared by the theme grid and the preview carousel. QPixmapCache
+# accounts for the pixmaps' size and evicts least recently used ones past the limit.
+QPixmapCache.setCacheLimit(IMAGE_MEMORY_CACHE_MB * 1024)
+
+
+def cover_key(image_url, device_pixel_ratio):
+    return f"cover:{device_pixel_ratio:g}:{image_url}"
+
+
+def carousel_key(image_url, width, height, device_pixel_ratio):
+    return f"carousel:{width}x{height}@{device_pixel_ratio:g}:{image_url}"
+
+
+def find_pixmap(key):
+    """Return the cached QPixmap for key, or None."""
+    return QPixmapCache.find(key)
+
+
+def insert_pixmap(key, pixmap):
+    QPixmapCache.insert(key, pixmap)
@@ -1,5 +1,9 @@
 import sys
 import os
+from startup_profiler import profiler_from_argv
+
+# Started before any heavy import so the profile covers them
+profiler = profiler_from_argv(sys.argv)
 
 # [DEV] Load local .env if running directly from source
 _env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
@@ -44,17 +48,49 @@ sys.excepthook = local_crash_report
 
 
 import os
+import importlib.util
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QPalette, QColor
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QEvent
 from main_window import GrubThemeManagerApp
 
+class _FirstPaintWatcher(QObject):
+    """Marks the first paint of the main window and the first cards shown in its grid."""
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.painted = False
+        self.populated = False
+        window.installEventFilter(self)
+        window.theme_model.rowsInserted.connect(self._check_grid)
+        window.theme_model.modelReset.connect(self._check_grid)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and not self.painted:
+            self.painted = True
+            profiler.mark("first paint")
+            self._maybe_report()
+        return False
+
+    def _check_grid(self):
+        if not self.populated and self.window.theme_model.rowCount() > 0:
+            self.populated = True
+            profiler.mark("first grid populated")
+            self._maybe_report()
+
+    def _maybe_report(self):
+        # With a warm cache the grid can fill before the window is first painted
+        if self.painted and self.populated:
+            self.window.removeEventFilter(self)
+            profiler.report()
+
 if __name__ == "__main__":
-    try:
-        import requests
-    except ImportError:
+    # Only check that requests is installed; it is imported on first network use
+    if importlib.util.find_spec("requests") is None:
         print("Error: The 'requests' library is required.")
         sys.exit(1)
+    profiler.mark("imports")
 
     # Force dark window decorations on GTK/GNOME and Qt environments
     # Let the native Window Manager handle decorations and scaling
@@ -92,6 +128,11 @@ if __name__ == "__main__":
         QProgressBar::chunk { background-color: #a6e3a1; border-radius: 4px; }
     """)
 
+    profiler.mark("application setup")
+
     window = GrubThemeManagerApp()
+    profiler.mark("window construction")
+    if profiler.enabled:
+        _FirstPaintWatcher(window)
     window.show()
     sys.exit(app.exec())
@@ -1,15 +1,16 @@
-import webbrowser
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QPushButton, QScrollArea, QStackedWidget,
-                             QMessageBox, QApplication, QGridLayout, QLineEdit, QSizePolicy, QComboBox)
+                             QLabel, QPushButton, QStackedWidget,
+                             QMessageBox, QApplication, QLineEdit, QSizePolicy, QComboBox)
 from PyQt6.QtGui import QFont, QIcon
-from PyQt6.QtCore import Qt, QSize, QObject, QEvent, QRect
+from PyQt6.QtCore import Qt, QSize, QObject, QEvent, QRect, QTimer
 
-from constants import WINDOW_TITLE, WINDOW_WIDTH, WINDOW_HEIGHT, ERROR_NO_THEMES
-from models import Theme
-from ui_widgets import ThemeCard, ImageCarousel, InstallationProgressDialog
-from theme_fetcher import ThemeFetcher, CarouselImageFetcher
-from theme_installer import ThemeInstaller
+from constants import (WINDOW_TITLE, WINDOW_WIDTH, WINDOW_HEIGHT, ERROR_NO_THEMES, SEARCH_DEBOUNCE_MS,
+                       PREFETCH_IDLE_MS, PREFETCH_IDLE_THEMES, USE_PRIVILEGED_HELPER)
+from models import Theme, author_name
+from ui_widgets import (ThemeListModel, ThemeGridView, ImageCarousel,
+                        InstallationProgressDialog)
+from theme_fetcher import ThemeFetcher, ShardedThemeIndex, Prefetcher, shutdown_image_pool
+from theme_search import ThemeSearchWorker
 
 
 
@@ -22,28 +23,42 @@ class GrubThemeManagerApp(QMainWindow):
         
         self.current_theme = None
         self.themes_data = []
+        # Set when the index is a manifest of shards loaded on demand
+        self.theme_index = None
+        self.helper = None
+        self._search_generation = 0
+        self._keep_scroll = False
         
         self.central_widget = QStackedWidget(self)
         self.setCentralWidget(self.central_widget)
         
         self.home_page = QWidget()
-        self.preview_page = QWidget()
+        # Built the first time a theme is opened, to keep it off the start-up path
+        self.preview_page = None
         
         self.setup_home_page()
-        self.setup_preview_page()
         
         self.central_widget.addWidget(self.home_page)
-        self.central_widget.addWidget(self.preview_page)
         
+        self.search_worker = ThemeSearchWorker()
+        self.search_worker.results_ready.connect(self.on_search_results)
+        self.search_worker.start()
+
         self.start_theme_fetching()
 
     def closeEvent(self, event):
-        if hasattr(self, 'fetcher') and self.fetcher.isRunning():
-            self.fetcher.terminate()
-            self.fetcher.wait()
-        if hasattr(self, 'carousel_fetcher') and getattr(self, 'carousel_fetcher').isRunning():
-            self.carousel_fetcher.terminate()
-            self.carousel_fetcher.wait()
+        if hasattr(self, 'fetcher'):
+            self.fetcher.stop()
+        if self.preview_page is not None:
+            self.carousel.clear_carousel()
+        self.prefetcher.clear()
+        if self.theme_index is not None:
+            self.theme_index.cancel()
+        self.search_worker.stop()
+        self.theme_model.cancel_fetches()
+        shutdown_image_pool()
+        if self.helper is not None:
+            self.helper.close()
         event.accept()
 
     def setup_home_page(self):
@@ -69,27 +84,41 @@ class GrubThemeManagerApp(QMainWindow):
             QLineEdit { background-color: #181825; border: 1px solid #313244; border-radius: 22px; padding: 0 20px; color: #cdd6f4; font-size: 15px; }
             QLineEdit:focus { border: 1px solid #89b4fa; }
         """)
-        self.search_bar.textChanged.connect(self.filter_themes)
+        # Only search once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.filter_themes)
+        self.search_bar.textChanged.connect(lambda: self.search_timer.start())
+        self.search_bar.textChanged.connect(lambda: self.idle_timer.start())
         header_layout.addWidget(self.search_bar)
         
         layout.addLayout(header_layout)
 
         # Grid Area
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        
-        self.grid_container = QWidget()
-        self.grid_layout = QGridLayout(self.grid_container)
-        self.grid_layout.setSpacing(25)
-        self.grid_layout.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignHCenter)
-        self.grid_layout.setContentsMargins(10, 10, 10, 10)
-
-        self.scroll_area.setWidget(self.grid_container)
-        layout.addWidget(self.scroll_area, 1)
+        self.theme_model = ThemeListModel(self)
+        self.theme_grid = ThemeGridView()
+        self.theme_grid.setModel(self.theme_model)
+        self.theme_grid.theme_clicked.connect(self.show_preview)
+
+        # Warm preview screenshots for hovered themes, and for visible ones once the user pauses
+        self.prefetcher = Prefetcher()
+        self.theme_grid.theme_hovered.connect(self.prefetcher.prefetch_theme)
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(PREFETCH_IDLE_MS)
+        self.idle_timer.timeout.connect(self.prefetch_visible_themes)
+        self.theme_grid.verticalScrollBar().valueChanged.connect(lambda: self.idle_timer.start())
+        layout.addWidget(self.theme_grid, 1)
+
+        self.empty_label = QLabel(ERROR_NO_THEMES)
+        self.empty_label.setStyleSheet("color: #a6adc8; font-size: 16px;")
+        self.empty_label.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignHCenter)
+        self.empty_label.hide()
+        layout.addWidget(self.empty_label, 1)
     
     def setup_preview_page(self):
+        self.preview_page = QWidget()
         layout = QVBoxLayout(self.preview_page)
         layout.setContentsMargins(50, 40, 50, 40)
         layout.setSpacing(20)
@@ -177,98 +206,124 @@ class GrubThemeManagerApp(QMainWindow):
         if hasattr(self, 'size_grip'):
             self.size_grip.move(self.width() - self.size_grip.width(), self.height() - self.size_grip.height())
             self.size_grip.raise_()
-            
-        if self.central_widget.currentWidget() == self.home_page and self.themes_data:
-            self._repopulate_grid(self.themes_data)
-
-    def _repopulate_grid(self, themes):
-        CARD_WIDTH = 280
-        SPACING = 25 
-        available_width = self.scroll_area.viewport().width() - 40
-        num_columns = max(1, int(available_width // (CARD_WIDTH + SPACING)))
-        
-        current_theme_ids = [t.name for t in themes]
-        if getattr(self, '_last_columns', 0) == num_columns and getattr(self, '_last_themes', []) == current_theme_ids:
-            return
-            
-        self._last_columns = num_columns
-        self._last_themes = current_theme_ids
-        
-        # Clean up old containers (handles both old and new architecture)
-        if hasattr(self, 'wrapper_widget') and self.wrapper_widget:
-            self.wrapper_widget.hide()
-            self.wrapper_widget.deleteLater()
-        elif hasattr(self, 'grid_container') and self.grid_container:
-            self.grid_container.hide()
-            self.grid_container.deleteLater()
-            
-        # THE FIX: A wrapper widget with stretching margins on both sides
-        self.wrapper_widget = QWidget()
-        self.wrapper_widget.setStyleSheet("background-color: transparent;")
-        wrapper_layout = QHBoxLayout(self.wrapper_widget)
-        wrapper_layout.setContentsMargins(0, 0, 0, 0)
-        
-        self.grid_container = QWidget()
-        self.grid_layout = QGridLayout(self.grid_container)
-        self.grid_layout.setSpacing(SPACING)
-        # The cards stay left-aligned *inside* their block
-        self.grid_layout.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-        self.grid_layout.setContentsMargins(10, 10, 10, 10)
-        
-        # Squeeze the grid block into the exact center of the screen
-        wrapper_layout.addStretch(1)
-        wrapper_layout.addWidget(self.grid_container)
-        wrapper_layout.addStretch(1)
-        
-        self.scroll_area.setWidget(self.wrapper_widget)
-        
-        if not themes:
-            lbl = QLabel(ERROR_NO_THEMES)
-            lbl.setStyleSheet("color: #a6adc8; font-size: 16px;")
-            self.grid_layout.addWidget(lbl, 0, 0)
-            return
 
-        row, col = 0, 0
-        for theme in themes:
-            card = ThemeCard(theme)
-            card.mousePressEvent = lambda e, t=theme: self.show_preview(t)
-            self.grid_layout.addWidget(card, row, col)
-            col += 1
-            if col >= num_columns:
-                col = 0
-                row += 1
+    def _show_themes(self, themes, keep_scroll=False, more=None):
+        scroll = self.theme_grid.verticalScrollBar().value()
+        self.theme_model.more = more
+        self.theme_model.set_themes(themes)
+        if keep_scroll:
+            self.theme_grid.verticalScrollBar().setValue(scroll)
+        else:
+            self.theme_grid.scrollToTop()
+        self._update_placeholder()
+        self.idle_timer.start()
+
+    def _update_placeholder(self):
+        # An empty grid only means "no themes" once every shard has arrived
+        waiting = self.theme_index is not None and not self.theme_index.is_complete()
+        has_rows = self.theme_model.rowCount() > 0
+        self.empty_label.setText(ERROR_NO_THEMES)
+        self.theme_grid.setVisible(has_rows or waiting)
+        self.empty_label.setVisible(not has_rows and not waiting)
+
+    def prefetch_visible_themes(self):
+        if self.central_widget.currentWidget() != self.home_page:
+            return
+        for row in list(self.theme_grid.visible_rows())[:PREFETCH_IDLE_THEMES]:
+            self.prefetcher.prefetch_theme(self.theme_model.themes[row])
 
     def start_theme_fetching(self):
         self.fetcher = ThemeFetcher()
+        self.fetcher.themes_batch.connect(self.append_themes)
         self.fetcher.themes_fetched.connect(self.populate_grid)
+        self.fetcher.manifest_fetched.connect(self.use_sharded_index)
+        self.fetcher.download_progress.connect(self.show_download_progress)
         self.fetcher.start()
-        
+
+    def show_download_progress(self, received, total):
+        # Only a first start, with no cached index, has nothing else to show meanwhile
+        if self.theme_model.rowCount() > 0:
+            return
+        if total:
+            self.empty_label.setText(f"Downloading theme index... {received * 100 // total}%")
+        else:
+            self.empty_label.setText(f"Downloading theme index... {received / (1024 * 1024):.1f} MB")
+        self.theme_grid.hide()
+        self.empty_label.show()
+
+    def append_themes(self, batch):
+        # Early batches of the first index load; populate_grid follows with the full list
+        self.themes_data.extend(batch)
+        if not self.search_bar.text().strip():
+            self.theme_model.append_themes(batch)
+            self._update_placeholder()
+
+    def use_sharded_index(self, shards):
+        # Shards are loaded as the grid scrolls towards them, or all at once for a search
+        if self.theme_index is not None:
+            self.theme_index.cancel()
+        self.theme_index = ShardedThemeIndex(shards)
+        self.theme_index.shard_loaded.connect(self.on_shard_loaded)
+        self.themes_data = []
+        self.search_worker.set_themes([])
+        self.filter_themes()
+
+    def on_shard_loaded(self, themes):
+        self.themes_data.extend(themes)
+        self.search_worker.set_themes(self.themes_data)
+        if self.search_bar.text().strip():
+            self.filter_themes(keep_scroll=True)
+            return
+        self.theme_model.append_themes(themes)
+        self._update_placeholder()
+        if not themes:
+            # A failed shard adds no rows, so nothing else would ask for the next one
+            self.theme_grid.update_fetch_window()
+
     def populate_grid(self, themes):
+        # Called again when a background refresh replaces the cached index
+        if self.theme_index is not None:
+            self.theme_index.cancel()
+            self.theme_index = None
+        refresh = bool(self.themes_data)
         self.themes_data = themes
-        self._repopulate_grid(self.themes_data)
+        self.search_worker.set_themes(themes)
+        self.filter_themes(keep_scroll=refresh)
+
+    def filter_themes(self, keep_scroll=False):
+        query = self.search_bar.text().strip()
+        self._keep_scroll = keep_scroll
+        if query:
+            # Searching needs the whole catalog
+            if self.theme_index is not None:
+                self.theme_index.load_all()
+            self._search_generation = self.search_worker.submit(query)
+        else:
+            self._search_generation = self.search_worker.cancel()
+            self._show_themes(self.themes_data, keep_scroll, more=self.theme_index)
 
-    def filter_themes(self):
-        query = self.search_bar.text().lower()
-        filtered = [t for t in self.themes_data if query in t.name.lower() or query in t.created_by.lower()] if query else self.themes_data
-        self._repopulate_grid(filtered)
+    def on_search_results(self, generation, themes):
+        if generation == self._search_generation:
+            self._show_themes(themes, self._keep_scroll)
 
     def show_preview(self, theme):
+        if self.preview_page is None:
+            self.setup_preview_page()
+            self.central_widget.addWidget(self.preview_page)
         self.current_theme = theme
         self.preview_title.setText(theme.name)
-        self.preview_author.setText(f"Created by {theme.created_by.get('name', 'Unknown') if isinstance(theme.created_by, dict) else theme.created_by}")
+        self.preview_author.setText(f"Created by {author_name(theme)}")
         self.preview_desc.setText(theme.description)
         
         self.size_selector.clear()
-        for opt in getattr(theme, 'size_options', []):
-            self.size_selector.addItem(opt.get('name', 'Unknown Size'))
-        
-        self.carousel.show_loading()
-        self.carousel_fetcher = CarouselImageFetcher(theme.carousel_images)
-        self.carousel_fetcher.images_loaded.connect(self.carousel.load_images)
-        self.carousel_fetcher.error_occurred.connect(self.carousel.show_error_message)
-        self.carousel_fetcher.start()
+        for opt in theme.size_options:
+            self.size_selector.addItem(opt.name)
         
+        # Switch first so the carousel has its real size to scale images to
         self.central_widget.setCurrentWidget(self.preview_page)
+        self.preview_page.layout().activate()
+
+        self.carousel.load_urls(theme.carousel_images)
 
     def open_repo(self):
         if not self.current_theme: return
@@ -277,7 +332,7 @@ class GrubThemeManagerApp(QMainWindow):
         if selected_index < 0: return # Safety check
         
         size_opt = self.current_theme.size_options[selected_index]
-        repo_link = size_opt.get('repo_link')
+        repo_link = size_opt.repo_link
         
         if repo_link:
             import webbrowser
@@ -294,10 +349,15 @@ class GrubThemeManagerApp(QMainWindow):
         self.install_btn.setEnabled(False)
         self.install_btn.setText("Installing...")
         
+        # The installer is only needed once something is installed
+        from theme_installer import ThemeInstaller, get_privileged_helper
+        if USE_PRIVILEGED_HELPER:
+            self.helper = get_privileged_helper()
+
         self.progress_dialog = InstallationProgressDialog(self)
         self.progress_dialog.show()
         
-        self.installer = ThemeInstaller(self.current_theme.name, size_opt['repo_link'], size_opt['branch_name'])
+        self.installer = ThemeInstaller(self.current_theme.name, size_opt.repo_link, size_opt.branch_name, self.helper)
         self.installer.progress_updated.connect(self.progress_dialog.update_progress)
         self.installer.installation_completed.connect(self.on_install_done)
         self.installer.start()
@@ -1,10 +1,69 @@
+import sys
+
+class SizeOption:
+    """One installable variant (resolution) of a theme."""
+    __slots__ = ('name', 'repo_link', 'branch_name')
+
+    def __init__(self, data):
+        self.name = _intern(data.get("name") or "Unknown Size")
+        self.repo_link = _intern(data.get("repo_link"))
+        self.branch_name = _intern(data.get("branch_name"))
+
+    def to_row(self):
+        return (self.name, self.repo_link, self.branch_name)
+
+    @classmethod
+    def from_row(cls, row):
+        option = cls.__new__(cls)
+        option.name, option.repo_link, option.branch_name = row
+        return option
+
 
 class Theme:
+    """
+    One entry of the theme index.
+
+    Slotted, with list fields stored as tuples and repeated strings (URLs shared
+    between the cover and the carousel, author names, repository links)
+    interned, so a catalog of thousands of themes stays small once the parsed
+    JSON is released.
+    """
+    __slots__ = ('id', 'name', 'cover_image', 'description', 'carousel_images', 'size_options', 'created_by')
+
+    # Layout of to_row(); bump it whenever that changes so old index snapshots are ignored
+    SNAPSHOT_SCHEMA = 1
+
     def __init__(self, data):
         self.id = data.get("id")
         self.name = data.get("name")
-        self.cover_image = data.get("cover_image")
+        self.cover_image = _intern(data.get("cover_image"))
         self.description = data.get("description", "")
-        self.carousel_images = data.get("carousel_images", [])
-        self.size_options = data.get("size_options", [])
-        self.created_by = data.get("created_by", {})
+        self.carousel_images = tuple(_intern(url) for url in data.get("carousel_images") or ())
+        self.size_options = tuple(SizeOption(opt) for opt in data.get("size_options") or ())
+        self.created_by = _intern(data.get("created_by") or "")
+
+    def to_row(self):
+        """Return the theme as a tuple of plain values, for the binary index snapshot."""
+        return (self.id, self.name, self.cover_image, self.description, self.carousel_images,
+                tuple(option.to_row() for option in self.size_options), self.created_by)
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild a theme from to_row() output without going through the JSON dict form."""
+        theme = cls.__new__(cls)
+        (theme.id, theme.name, theme.cover_image, theme.description, theme.carousel_images,
+         size_options, theme.created_by) = row
+        theme.size_options = tuple(SizeOption.from_row(option) for option in size_options)
+        return theme
+
+
+def author_name(theme, default="Unknown"):
+    """Return the name of a theme's author (created_by may be a name or a {"name": ...} dict)."""
+    created_by = theme.created_by
+    if isinstance(created_by, dict):
+        created_by = created_by.get("name")
+    return created_by or default
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
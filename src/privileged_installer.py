@@ -1,7 +1,18 @@
 import sys
 import os
+import json
+import errno
+import select
+import shlex
+import ctypes
+import filecmp
 import shutil
+import tempfile
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from theme_store import ThemeStore, test_override
+from grub_config import read_grub_theme, set_grub_theme, fast_apply
 
 # This script is designed to be executed with elevated privileges (e.g., via pkexec)
 # It should ONLY perform the tasks necessary for theme installation and nothing else.
@@ -10,10 +21,17 @@ def report_progress(percentage, message):
     """Prints progress updates to stdout for the main application to read."""
     print(f"PROGRESS:{percentage}:{message}", flush=True)
 
+GRUB_THEMES_DIR = test_override("GRUBDECK_THEMES_DIR") or "/boot/grub/themes"
+# Themes fetched at once in a batch install
+BATCH_FETCH_WORKERS = 4
+# Seconds a --serve helper waits for its next request before exiting
+HELPER_IDLE_TIMEOUT = 600
+
 def find_grub_config_and_update_command():
-    import shutil
-    grub_config_path = "/etc/default/grub"
-    if shutil.which("update-grub"):
+    grub_config_path = test_override("GRUBDECK_GRUB_DEFAULT") or "/etc/default/grub"
+    if test_override("GRUBDECK_GRUB_MKCONFIG"):
+        grub_update_command = shlex.split(test_override("GRUBDECK_GRUB_MKCONFIG"))
+    elif shutil.which("update-grub"):
         grub_update_command = ["update-grub"]
     elif shutil.which("grub-mkconfig"):
         grub_update_command = ["grub-mkconfig", "-o", "/boot/grub/grub.cfg"]
@@ -23,6 +41,187 @@ def find_grub_config_and_update_command():
         grub_update_command = ["update-grub"]
     return grub_config_path, grub_update_command
 
+def generated_config_path(grub_update_command):
+    """The grub.cfg the update command writes (update-grub always writes /boot/grub/grub.cfg)."""
+    if "-o" in grub_update_command[:-1]:
+        return grub_update_command[grub_update_command.index("-o") + 1]
+    return "/boot/grub/grub.cfg"
+
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+def exchange_dirs(a, b):
+    """Atomically swap two paths on the same filesystem (renameat2 RENAME_EXCHANGE)."""
+    libc = ctypes.CDLL(None, use_errno=True)
+    renameat2 = getattr(libc, "renameat2", None)
+    if renameat2 is None:
+        raise OSError(errno.ENOSYS, "renameat2 is not available")
+    if renameat2(_AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), a)
+
+def deploy_theme(source_dir, themes_dir, theme_name):
+    """
+    Install source_dir as themes_dir/theme_name without it ever being partially written.
+
+    The new tree is staged inside themes_dir (so on the same filesystem) and
+    swapped in with one rename; files unchanged since the previous install are
+    hard-linked from it instead of written again. Returns (written, reused).
+    Raises ValueError, leaving the current install alone, if source_dir has
+    no theme.txt.
+    """
+    _check_theme_name(theme_name)
+    # Never swap a broken tree in place of a working install
+    if not os.path.isfile(os.path.join(source_dir, "theme.txt")):
+        raise ValueError(f"No theme.txt in the theme's files ({source_dir}); nothing was installed.")
+    destination = os.path.join(themes_dir, theme_name)
+    os.makedirs(themes_dir, exist_ok=True)
+    _remove_leftovers(themes_dir, theme_name)
+
+    staging = tempfile.mkdtemp(prefix=f".{theme_name}.staging-", dir=themes_dir)
+    try:
+        written, reused = _stage_tree(source_dir, staging, destination)
+        if not os.path.isfile(os.path.join(staging, "theme.txt")):
+            raise ValueError(f"theme.txt could not be staged from {source_dir}; nothing was installed.")
+        os.chmod(staging, 0o755)
+        _sync_dir(themes_dir)
+
+        if not os.path.isdir(destination):
+            os.rename(staging, destination)
+        else:
+            try:
+                exchange_dirs(staging, destination)
+            except OSError as e:
+                if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP):
+                    raise
+                # No atomic exchange here (e.g. vfat): the theme is briefly absent, but never half-written
+                retired = tempfile.mkdtemp(prefix=f".{theme_name}.old-", dir=themes_dir)
+                os.rename(destination, os.path.join(retired, "theme"))
+                try:
+                    os.rename(staging, destination)
+                except OSError:
+                    # Put the previous install back rather than leave the theme missing
+                    os.rename(os.path.join(retired, "theme"), destination)
+                    os.rmdir(retired)
+                    raise
+                staging = retired
+        _sync_dir(themes_dir)
+    finally:
+        # After a swap this holds the previous install
+        shutil.rmtree(staging, ignore_errors=True)
+    return written, reused
+
+def _stage_tree(source_dir, staging, previous):
+    written = reused = 0
+    can_link = True
+    source_root = os.path.realpath(source_dir)
+    for root, dirs, files in os.walk(source_dir):
+        rel_root = os.path.relpath(root, source_dir)
+        for name in dirs:
+            if not os.path.islink(os.path.join(root, name)):
+                os.makedirs(os.path.join(staging, rel_root, name), mode=0o755, exist_ok=True)
+        for name in files:
+            rel = os.path.normpath(os.path.join(rel_root, name))
+            src = os.path.join(source_dir, rel)
+            # Symlinks are followed only while they stay inside the theme
+            real = os.path.realpath(src)
+            if not real.startswith(source_root + os.sep) or not os.path.isfile(real):
+                continue
+            dst = os.path.join(staging, rel)
+            old = os.path.join(previous, rel)
+            if can_link and os.path.isfile(old) and not os.path.islink(old) and filecmp.cmp(real, old, shallow=False):
+                try:
+                    os.link(old, dst)
+                    reused += 1
+                    continue
+                except OSError:
+                    # The filesystem has no hard links (vfat); copy everything from here on
+                    can_link = False
+            with open(real, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+                fdst.flush()
+                os.fsync(fdst.fileno())
+            os.chmod(dst, 0o644)
+            written += 1
+    return written, reused
+
+def _remove_leftovers(themes_dir, theme_name):
+    # Staging or retired trees left behind by an interrupted install of this
+    # theme. A retired tree is the previous install: if the install died before
+    # its replacement was renamed in, it is put back instead of deleted
+    destination = os.path.join(themes_dir, theme_name)
+    for name in os.listdir(themes_dir):
+        if not name.startswith((f".{theme_name}.staging-", f".{theme_name}.old-")):
+            continue
+        path = os.path.join(themes_dir, name)
+        previous = os.path.join(path, "theme")
+        if name.startswith(f".{theme_name}.old-") and os.path.isdir(previous) and not os.path.lexists(destination):
+            try:
+                os.rename(previous, destination)
+            except OSError:
+                pass
+        shutil.rmtree(path, ignore_errors=True)
+
+def _sync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def install_theme_files(theme_name, repo_link, branch_name, progress, prune=True):
+    """
+    Steps 1 and 2: get the theme's tree and deploy it into the GRUB themes directory.
+
+    Returns the stored tree it was deployed from.
+    """
+    # --- 1. Get the theme files ---
+    # Trees are kept per repository and commit, so reinstalling a theme (or
+    # switching back to one) whose branch has not moved is a local copy
+    progress(10, "Preparing theme files...")
+    source_dir = ThemeStore().checkout(repo_link, branch_name, progress, prune=prune)
+    
+    # --- 2. Copy the theme to the GRUB themes directory ---
+    # Staged next to the destination and swapped in atomically; unchanged files are hard-linked
+    progress(50, "Moving theme to GRUB directory...")
+    written, reused = deploy_theme(source_dir, GRUB_THEMES_DIR, theme_name)
+    
+    progress(70, f"Theme files copied ({written} written, {reused} unchanged).")
+    return source_dir
+
+def activate_theme(theme_name, progress):
+    """Steps 3 and 4: point GRUB_THEME at an installed theme and apply it to grub.cfg."""
+    # --- 3. Update the GRUB configuration ---
+    progress(80, "Updating GRUB configuration...")
+    
+    grub_config_path, grub_update_command = find_grub_config_and_update_command()
+    theme_path = os.path.join(GRUB_THEMES_DIR, theme_name, "theme.txt")
+    previous_theme = read_grub_theme(grub_config_path)
+    set_grub_theme(grub_config_path, theme_path)
+    
+    progress(90, "GRUB configuration updated.")
+
+    # --- 4. Apply the change to grub.cfg ---
+    # Only the theme block of the generated file depends on GRUB_THEME, so it
+    # is edited in place; update-grub (which re-probes every OS) only runs
+    # when that block is missing or does not look the way 00_header writes it
+    applied = fast_apply(generated_config_path(grub_update_command), theme_path, previous_theme)
+    if applied == "unchanged":
+        progress(95, "GRUB menu already uses this theme.")
+    elif applied == "updated":
+        progress(95, "Theme applied to the GRUB menu.")
+    else:
+        progress(95, "Applying changes with update-grub...")
+        subprocess.run(
+            grub_update_command,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+
 def run_installation():
     """
     Main function to handle the theme installation process.
@@ -39,70 +238,8 @@ def run_installation():
     report_progress(5, f"Starting installation of '{theme_name}'...")
 
     try:
-        # --- 1. Clone the theme repository ---
-        report_progress(10, "Cloning theme repository...")
-        temp_dir = "/tmp/grubdeck_theme_temp"
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        
-        # We need the full repository link, but only the last part for the directory name
-        repo_dir_name = repo_link.split('/')[-1].replace('.git', '')
-        
-        subprocess.run(
-            ['git', 'clone', '--depth=1', '-b', branch_name, repo_link, temp_dir],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        report_progress(40, "Repository cloned successfully.")
-        
-        # --- 2. Move the theme to the GRUB themes directory ---
-        report_progress(50, "Moving theme to GRUB directory...")
-        grub_themes_path = "/boot/grub/themes"
-        theme_destination = os.path.join(grub_themes_path, theme_name)
-        
-        if os.path.exists(theme_destination):
-            shutil.rmtree(theme_destination)
-            
-        shutil.copytree(temp_dir, theme_destination)
-        
-        # Clean up the temporary directory
-        shutil.rmtree(temp_dir)
-        
-        report_progress(70, "Theme files copied.")
-
-        # --- 3. Update the GRUB configuration ---
-        report_progress(80, "Updating GRUB configuration...")
-        
-        grub_config_path, grub_update_command = find_grub_config_and_update_command()
-
-        with open(grub_config_path, 'r') as f:
-            lines = f.readlines()
-        
-        with open(grub_config_path, 'w') as f:
-            for line in lines:
-                if line.startswith("GRUB_THEME="):
-                    f.write(f'GRUB_THEME="/boot/grub/themes/{theme_name}/theme.txt"\n')
-                else:
-                    f.write(line)
-            
-            # Add GRUB_THEME if it wasn't found
-            if not any(line.startswith("GRUB_THEME=") for line in lines):
-                f.write(f'GRUB_THEME="/boot/grub/themes/{theme_name}/theme.txt"\n')
-        
-        report_progress(90, "GRUB configuration updated.")
-
-        # --- 4. Run GRUB update command to apply changes ---
-        report_progress(95, "Applying changes with update-grub...")
-        subprocess.run(
-            grub_update_command,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        install_theme_files(theme_name, repo_link, branch_name, report_progress)
+        activate_theme(theme_name, report_progress)
         
         report_progress(100, "Installation complete.")
         sys.exit(0) # Success
@@ -113,13 +250,261 @@ def run_installation():
     except subprocess.CalledProcessError as e:
         print(f"Error: Command failed with exit code {e.returncode}. Output: {e.stderr}", file=sys.stderr)
         # Check for GRUB update failure specifically
-        if 'grub-mkconfig' in e.cmd[0] or 'update-grub' in e.cmd[0]:
-            sys.exit(2) # Specific code for GRUB update failure
+        sys.exit(2 if _is_grub_update(e) else 1)
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def parse_jobs(jobs, activate=None):
+    """
+    Validate a batch's job list and the theme to activate afterwards.
+
+    Returns the jobs as (theme, repo, branch) tuples and the theme to activate,
+    which defaults to the last job's and must be one of the jobs.
+    """
+    try:
+        parsed = [(job["theme"], job["repo"], job["branch"]) for job in jobs]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid batch request: {e}")
+    if not parsed:
+        raise ValueError("Invalid batch request: there are no themes to install.")
+    names = [name for name, _, _ in parsed]
+    if len(set(names)) != len(names):
+        raise ValueError("Invalid batch request: a theme name appears more than once.")
+    if activate is None:
+        activate = names[-1]
+    elif activate not in names:
+        raise ValueError(f"Invalid batch request: '{activate}' is not one of the themes being installed.")
+    return parsed, activate
+
+def install_batch(jobs, progress, job_progress, job_done):
+    """
+    Fetch and deploy several themes, returning the names of those installed.
+
+    job_progress(index, percentage, message) and job_done(index, ok, message)
+    may be called from fetch threads. A failed job does not stop the others.
+    """
+    installed = set()
+    if not jobs:
+        return installed
+    # Stored trees each job deployed, by repository
+    used = {}
+
+    def install(index):
+        theme_name, repo_link, branch_name = jobs[index]
+        # Pruning now could delete a tree another job of the same repository is still copying
+        used.setdefault(repo_link, []).append(install_theme_files(
+            theme_name, repo_link, branch_name,
+            lambda percentage, message: job_progress(index, percentage, message), prune=False))
+        return theme_name
+
+    # Jobs only overlap while fetching; a repository's mirror lock keeps jobs from one repository in turn
+    with ThreadPoolExecutor(max_workers=BATCH_FETCH_WORKERS) as pool:
+        futures = {pool.submit(install, index): index for index in range(len(jobs))}
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                installed.add(future.result())
+                job_done(index, True, f"Theme '{jobs[index][0]}' installed.")
+            except Exception as e:
+                detail = e.stderr.strip() if isinstance(e, subprocess.CalledProcessError) and e.stderr else e
+                job_done(index, False, str(detail))
+            progress(5 + 70 * done // len(jobs), f"{done} of {len(jobs)} themes processed.")
+
+    store = ThemeStore()
+    for repo_link, trees in used.items():
+        try:
+            store.prune(repo_link, keep=trees)
+        except OSError:
+            # Only housekeeping; the themes are installed
+            pass
+    return installed
+
+def run_batch():
+    """
+    Install several themes in one privileged session (--batch).
+
+    The request is read from stdin as JSON:
+
+        {"jobs": [{"theme": ..., "repo": ..., "branch": ...}, ...], "activate": <theme>}
+
+    Themes are fetched concurrently and deployed as each one arrives; GRUB is
+    then pointed at `activate` (the last job by default) and updated once.
+    Besides the overall PROGRESS lines, each job reports
+    JOB:<index>:<percentage>:<message> and finally JOB_DONE:<index>:ok|error:<message>.
+    Exits 1 if any job failed and 2 if the GRUB update failed.
+    """
+    try:
+        request = json.load(sys.stdin)
+        jobs, activate = parse_jobs(request["jobs"], request.get("activate"))
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    report_progress(5, f"Starting installation of {len(jobs)} themes...")
+    lock = threading.Lock()
+
+    def job_progress(index, percentage, message):
+        with lock:
+            print(f"JOB:{index}:{percentage}:{message}", flush=True)
+
+    def job_done(index, ok, message):
+        status = "ok" if ok else "error"
+        with lock:
+            print(f"JOB_DONE:{index}:{status}:{message}".replace("\n", " "), flush=True)
+
+    installed = install_batch(jobs, report_progress, job_progress, job_done)
+    failed = len(jobs) - len(installed)
+    try:
+        if activate in installed:
+            activate_theme(activate, report_progress)
         else:
-            sys.exit(1)
+            print(f"Error: '{activate}' was not installed, so GRUB was left unchanged.", file=sys.stderr)
+    except subprocess.CalledProcessError as e:
+        print(f"Error: Command failed with exit code {e.returncode}. Output: {e.stderr}", file=sys.stderr)
+        sys.exit(2 if _is_grub_update(e) else 1)
     except Exception as e:
         print(f"An unexpected error occurred: {e}", file=sys.stderr)
         sys.exit(1)
 
+    if failed:
+        print(f"Error: {failed} of {len(jobs)} themes could not be installed.", file=sys.stderr)
+        sys.exit(1)
+    report_progress(100, "Installation complete.")
+    sys.exit(0)
+
+def remove_theme(theme_name, progress):
+    """Delete an installed theme; the one GRUB currently uses is refused."""
+    _check_theme_name(theme_name)
+    destination = os.path.join(GRUB_THEMES_DIR, theme_name)
+    grub_config_path, _ = find_grub_config_and_update_command()
+    if read_grub_theme(grub_config_path) == os.path.join(destination, "theme.txt"):
+        raise ValueError(f"'{theme_name}' is the active GRUB theme; activate another one first.")
+    if not os.path.isdir(destination):
+        raise ValueError(f"'{theme_name}' is not installed.")
+    progress(50, f"Removing '{theme_name}'...")
+    # Renamed away first, so the theme is either all there or gone
+    retired = tempfile.mkdtemp(prefix=f".{theme_name}.old-", dir=GRUB_THEMES_DIR)
+    os.rename(destination, os.path.join(retired, "theme"))
+    shutil.rmtree(retired, ignore_errors=True)
+    _sync_dir(GRUB_THEMES_DIR)
+
+def serve():
+    """
+    Handle requests from one session until it closes stdin or goes quiet (--serve).
+
+    Starting the helper costs one authentication prompt and one interpreter
+    start; every request after that runs at once. Requests and responses are
+    JSON objects, one per line:
+
+        -> {"id": 1, "method": "install", "params": {"theme": ..., "repo": ..., "branch": ...}}
+        <- {"id": 1, "event": "progress", "percentage": 50, "message": ...}
+        <- {"id": 1, "result": "Theme 'x' installed."}
+        <- {"id": 1, "error": ..., "code": 2}
+
+    Methods are install, install_batch ({"jobs", "activate"}, which also sends
+    "job" and "job_done" events), activate ({"theme"}), remove ({"theme"}),
+    ping and shutdown. Error codes follow the exit codes of a single install.
+    The helper exits after HELPER_IDLE_TIMEOUT seconds without a request.
+    """
+    lock = threading.Lock()
+
+    def send(message):
+        line = json.dumps(message)
+        with lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    for line in _read_lines(0, HELPER_IDLE_TIMEOUT):
+        try:
+            request = json.loads(line)
+            request_id = request["id"]
+            method = request["method"]
+            params = request.get("params") or {}
+        except (ValueError, KeyError, TypeError):
+            send({"id": None, "error": "Malformed request.", "code": 1})
+            continue
+
+        def progress(percentage, message, request_id=request_id):
+            send({"id": request_id, "event": "progress", "percentage": percentage, "message": message})
+
+        try:
+            if method == "shutdown":
+                send({"id": request_id, "result": "Bye."})
+                return
+            result = _handle(method, params, request_id, progress, send)
+            send({"id": request_id, "result": result})
+        except subprocess.CalledProcessError as e:
+            send({"id": request_id, "code": 2 if _is_grub_update(e) else 1,
+                  "error": f"Command failed with exit code {e.returncode}. Output: {e.stderr}"})
+        except Exception as e:
+            send({"id": request_id, "error": str(e), "code": 1})
+
+def _handle(method, params, request_id, progress, send):
+    if method == "ping":
+        return "pong"
+    if method == "install":
+        theme_name = params["theme"]
+        _check_theme_name(theme_name)
+        install_theme_files(theme_name, params["repo"], params["branch"], progress)
+        activate_theme(theme_name, progress)
+        return f"Theme '{theme_name}' installed successfully."
+    if method == "activate":
+        theme_name = params["theme"]
+        _check_theme_name(theme_name)
+        if not os.path.isfile(os.path.join(GRUB_THEMES_DIR, theme_name, "theme.txt")):
+            raise ValueError(f"'{theme_name}' is not installed.")
+        activate_theme(theme_name, progress)
+        return f"Theme '{theme_name}' activated."
+    if method == "remove":
+        remove_theme(params["theme"], progress)
+        return f"Theme '{params['theme']}' removed."
+    if method == "install_batch":
+        jobs, activate = parse_jobs(params["jobs"], params.get("activate"))
+
+        def job_progress(index, percentage, message):
+            send({"id": request_id, "event": "job", "index": index, "percentage": percentage, "message": message})
+
+        def job_done(index, ok, message):
+            send({"id": request_id, "event": "job_done", "index": index, "ok": ok, "message": message})
+
+        installed = install_batch(jobs, progress, job_progress, job_done)
+        if activate in installed:
+            activate_theme(activate, progress)
+        failed = len(jobs) - len(installed)
+        if failed:
+            raise ValueError(f"{failed} of {len(jobs)} themes could not be installed.")
+        return f"{len(jobs)} themes installed successfully."
+    raise ValueError(f"Unknown method: {method!r}")
+
+def _read_lines(fd, timeout):
+    # Read straight from the descriptor: lines sitting in a file object's
+    # buffer would be invisible to select() and wait out the idle timeout
+    buffer = b""
+    while True:
+        while b"\n" not in buffer:
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if not ready:
+                return
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return
+            buffer += chunk
+        line, buffer = buffer.split(b"\n", 1)
+        if line.strip():
+            yield line.decode("utf-8", "replace")
+
+def _check_theme_name(theme_name):
+    if not theme_name or theme_name in (".", "..") or "/" in theme_name or theme_name.startswith("."):
+        raise ValueError(f"Invalid theme name: {theme_name!r}")
+
+def _is_grub_update(error):
+    return 'grub-mkconfig' in error.cmd[0] or 'update-grub' in error.cmd[0]
+
 if __name__ == "__main__":
-    run_installation()
+    if sys.argv[1:] == ["--batch"]:
+        run_batch()
+    elif sys.argv[1:] == ["--serve"]:
+        serve()
+    else:
+        run_installation()
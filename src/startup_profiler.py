@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+
+class StartupProfiler:
+    """
+    Records how long each start-up phase takes and prints the breakdown.
+
+    Enabled with --profile-startup or GRUBDECK_PROFILE_STARTUP=1; when disabled
+    every call is a no-op, so the hooks can stay in place permanently.
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._last = self.started
+        self._phases = []
+        self._reported = False
+
+    def mark(self, phase):
+        """Close the phase that ends now, named after what just finished."""
+        if not self.enabled or self._reported:
+            return
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last, now - self.started))
+        self._last = now
+
+    def report(self):
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        print("Startup profile (ms):", file=sys.stderr)
+        for phase, took, total in self._phases:
+            print(f"  {phase:<24} {took * 1000:8.1f}   (at {total * 1000:8.1f})", file=sys.stderr)
+
+
+def profiler_from_argv(argv):
+    """Build the profiler for this run, removing --profile-startup from argv."""
+    enabled = os.environ.get("GRUBDECK_PROFILE_STARTUP", "") not in ("", "0")
+    if "--profile-startup" in argv:
+        argv.remove("--profile-startup")
+        enabled = True
+    return StartupProfiler(enabled)
@@ -1,110 +1,776 @@
+import gc
+import os
+import re
 import json
-import requests
-from PyQt6.QtCore import QThread, pyqtSignal
+import heapq
+import hashlib
+from collections import deque, namedtuple
+from urllib.parse import urljoin
+import itertools
+import threading
+from PyQt6.QtCore import QObject, QBuffer, QIODevice, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
 from models import Theme
-from constants import THEME_INDEX_URL, ERROR_NO_COVER_IMAGE
+from constants import (THEME_INDEX_URL, ERROR_NO_COVER_IMAGE, IMAGE_FETCH_WORKERS,
+                       THEME_FIRST_BATCH, THEME_BATCH_SIZE, INDEX_SHARD_TTL,
+                       HTTP_TIMEOUT, HTTP_CONNECTIONS_PER_HOST, HTTP_MAX_HOSTS,
+                       DOWNLOAD_CHUNK_SIZE, MAX_INDEX_BYTES, MAX_IMAGE_BYTES,
+                       PRIORITY_VISIBLE, PRIORITY_PREFETCH, PREFETCH_MAX_IN_FLIGHT,
+                       PREFETCH_MAX_QUEUED, PREFETCH_SLIDES_PER_THEME)
 from cache_manager import CacheManager
 
-# Initialize the global cache instance
+class HttpClient:
+    """
+    One keep-alive HTTP session shared by every fetcher thread.
+
+    Connections are pooled per host (so image-heavy grids reuse a handful of
+    warm TLS connections), pool_block caps concurrent connections to any one
+    host, and every request gets the same timeouts and retry policy. The
+    urllib3 pools underneath are thread-safe, and requests never mutate
+    shared session state beyond the (locked) cookie jar.
+    """
+
+    def __init__(self, connections_per_host=HTTP_CONNECTIONS_PER_HOST, max_hosts=HTTP_MAX_HOSTS,
+                 timeout=HTTP_TIMEOUT):
+        # requests (and urllib3 under it) is a large import; it is only paid for
+        # once something actually goes to the network, on a worker thread
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_hosts,
+            pool_maxsize=connections_per_host,
+            pool_block=True,
+            max_retries=Retry(total=2, connect=2, read=1, backoff_factor=0.3,
+                              status_forcelist=(502, 503, 504), allowed_methods=("GET", "HEAD")),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = "grubdeck"
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        return self.session.get(url, headers=headers, stream=stream, timeout=timeout or self.timeout)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the work; anyone asking for the same key
+    while it is in flight blocks until it finishes and gets the same result
+    (or the same exception). Nothing is remembered afterwards, so caching
+    stays the CacheManager's job.
+    """
+
+    class _Call:
+        __slots__ = ('done', 'result', 'error')
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+# Initialize the global cache; the HTTP client is created on first use
 cache = CacheManager()
+_http_client = None
+_http_client_lock = threading.Lock()
+# Downloads (keyed by URL) and derived thumbnails (keyed by thumbnail key) in flight
+_flights = SingleFlight()
+
+def get_http_client():
+    """Return the process-wide HttpClient, creating it on first use."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient()
+        return _http_client
+
+
+def fetch_to_cache(url, max_age_seconds, max_size=None, progress=None, keep_stale=False):
+    """
+    Return the path of a fresh cached copy of url, downloading it if needed.
+
+    A stale cached copy is revalidated with If-None-Match / If-Modified-Since; a
+    304 answer just renews it instead of downloading the body again. Bodies are
+    streamed to disk in chunks, so memory use does not depend on their size.
+    Concurrent calls for the same URL share a single download; progress, if
+    given, is called with (bytes received, total bytes or 0) for the caller
+    that actually performs it. keep_stale is passed on to CacheManager.set_stream.
+    """
+    path = _cached_path(url, max_age_seconds)
+    if path is not None:
+        return path
+    return _flights.do(url, lambda: _download(url, max_age_seconds, max_size, progress, keep_stale))
+
+
+def _cached_path(url, max_age_seconds):
+    # The cache's index is not checked against the disk on every lookup; an
+    # entry whose file has gone missing is dropped so it is downloaded again
+    path = cache.get_path(url, max_age_seconds)
+    if path is not None and not os.path.exists(path):
+        cache.invalidate(url, only_if_missing=True)
+        return None
+    return path
+
+
+def _download(url, max_age_seconds, max_size, progress, keep_stale):
+    # A waiter that joined late may find the leader before it already finished
+    path = _cached_path(url, max_age_seconds)
+    if path is not None:
+        return path
+
+    headers = cache.conditional_headers(url)
+    with get_http_client().get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304 and headers:
+            path = cache.revalidated(url, max_age_seconds)
+            if path is not None:
+                return path
+            # The stale copy disappeared in the meantime, fetch it unconditionally
+            return _download(url, max_age_seconds, max_size, progress, keep_stale)
+        response.raise_for_status()
+
+        total = int(response.headers.get("Content-Length") or 0)
+        if max_size is not None and total > max_size:
+            raise ValueError(f"Resource exceeds the {max_size} byte limit: {url}")
+        validators = {"etag": response.headers.get("ETag"),
+                      "last_modified": response.headers.get("Last-Modified")}
+        return cache.set_stream(
+            url, response.iter_content(DOWNLOAD_CHUNK_SIZE), max_age_seconds, validators,
+            max_size=max_size, progress=(lambda received: progress(received, total)) if progress else None,
+            keep_stale=keep_stale)
+
+
+def fetch_cached(url, max_age_seconds, max_size=None, progress=None, keep_stale=False):
+    """Return the body of url, from the cache while it is fresh, otherwise from the network."""
+    with open(fetch_to_cache(url, max_age_seconds, max_size, progress, keep_stale), 'rb') as f:
+        return f.read()
+
+
+def _local_path(url):
+    """Return the filesystem path a file:// URL or plain path refers to, or None for a remote URL."""
+    if url.startswith("file://"):
+        return url.replace("file://", "")
+    if url.startswith("/") or url.startswith("./") or url.startswith("~/"):
+        return os.path.expanduser(url)
+    return None
+
+
+_WHITESPACE = re.compile(r'\s*')
+
+def iter_theme_batches(text, first_batch=THEME_FIRST_BATCH, batch_size=THEME_BATCH_SIZE):
+    """
+    Decode a JSON array of themes entry by entry, yielding lists of Theme.
+
+    Each entry's dict is dropped as soon as its Theme is built, so the whole
+    index never exists twice in memory, and callers can show the first batch
+    while the rest is still being parsed.
+    """
+    decoder = json.JSONDecoder()
+    pos = _WHITESPACE.match(text).end()
+    if not text.startswith('[', pos):
+        raise ValueError("Theme index is not a JSON array")
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    if text.startswith(']', pos):
+        return
+
+    batch, limit = [], first_batch
+    while True:
+        data, pos = decoder.raw_decode(text, pos)
+        batch.append(Theme(data))
+        if len(batch) >= limit:
+            yield batch
+            batch, limit = [], batch_size
+
+        pos = _WHITESPACE.match(text, pos).end()
+        if text.startswith(',', pos):
+            pos = _WHITESPACE.match(text, pos + 1).end()
+        elif text.startswith(']', pos):
+            break
+        else:
+            raise ValueError(f"Malformed theme index at offset {pos}")
+    if batch:
+        yield batch
+
+
+def _snapshot_name(url):
+    return f"snapshot:{url}"
+
+
+def read_index_snapshot(url, digest):
+    """Return the themes of an index body with the given sha256 from its binary snapshot, or None."""
+    # Only acyclic tuples and strings are built here; keep the cycle collector from
+    # rescanning them over and over while tens of thousands are allocated
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        rows = cache.get_snapshot(_snapshot_name(url), Theme.SNAPSHOT_SCHEMA, digest)
+        if rows is None:
+            return None
+        return [Theme.from_row(row) for row in rows]
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def write_index_snapshot(url, digest, themes):
+    """Store themes parsed from an index body so the next start can skip the JSON."""
+    cache.set_snapshot(_snapshot_name(url), Theme.SNAPSHOT_SCHEMA, digest,
+                       tuple(theme.to_row() for theme in themes))
+
+
+class ThemeFetcher(QObject):
+    """
+    Loads the theme index.
 
-class ThemeFetcher(QThread):
+    Whatever copy of the index is in the cache is emitted straight away, even
+    if it is stale, so the grid never waits on the network. A stale copy is
+    then revalidated in the background and themes_fetched is emitted again
+    only if the index actually changed.
+
+    While the first copy is parsed, themes_batch carries each batch as it is
+    decoded; themes_fetched always follows with the complete list. Parsed
+    themes are also kept as a binary snapshot keyed by the index's hash, so a
+    start with an unchanged index skips JSON parsing altogether.
+
+    If the index is a manifest of shards instead of an array of themes,
+    manifest_fetched carries its IndexShard list and loading the shards
+    themselves is left to a ShardedThemeIndex.
+
+    When there is no cached copy at all, download_progress reports
+    (bytes received, total bytes or 0) while the index is downloaded.
+
+    The work runs on a daemon thread, like the ImageFetchPool's workers, so
+    closing the window during the background revalidation just stop()s it:
+    the request is abandoned and nothing more is emitted or cached.
+    """
+    themes_batch = pyqtSignal(list)
     themes_fetched = pyqtSignal(list)
+    manifest_fetched = pyqtSignal(list)
+    download_progress = pyqtSignal(int, int)
+
+    def __init__(self):
+        super().__init__()
+        self._stopping = False
+
+    def start(self):
+        threading.Thread(target=self.run, name="theme-fetcher", daemon=True).start()
+
+    def stop(self):
+        """Abandon the fetch; whatever it is blocked on finishes (or dies with the process) unseen."""
+        self._stopping = True
 
     def run(self):
+        self._streamed = False
+        self._progress_step = None
         try:
-            import os
             # 1. Determine if the URL is actually a local file path
-            is_local = False
-            local_path = THEME_INDEX_URL
-            
-            if THEME_INDEX_URL.startswith("file://"):
-                local_path = THEME_INDEX_URL.replace("file://", "")
-                is_local = True
-            elif THEME_INDEX_URL.startswith("/") or THEME_INDEX_URL.startswith("./") or THEME_INDEX_URL.startswith("~/"):
-                local_path = os.path.expanduser(THEME_INDEX_URL)
-                is_local = True
+            local_path = _local_path(THEME_INDEX_URL)
 
             # 2. Fetch the data
-            if is_local and os.path.exists(local_path):
+            if local_path is not None and os.path.exists(local_path):
                 # Bypass cache entirely for local files for instant dev feedback
-                with open(local_path, 'r', encoding='utf-8') as f:
-                    themes_data = json.load(f)
-            else:
-                # Standard network fetching with cache
-                cached_data = cache.get(THEME_INDEX_URL, max_age_seconds=3600)
-                if cached_data:
-                    themes_data = json.loads(cached_data.decode('utf-8'))
-                else:
-                    response = requests.get(THEME_INDEX_URL, timeout=15)
-                    response.raise_for_status()
-                    cache.set(THEME_INDEX_URL, response.content)
-                    themes_data = json.loads(response.text)
-            
-            themes = []
-            for data in themes_data:
-                theme = Theme(data)
-                themes.append(theme)
-            self.themes_fetched.emit(themes)
+                with open(local_path, 'rb') as f:
+                    self._load(f.read())
+                return
+
+            # Standard network fetching with cache, serving a stale copy first
+            cached_data, fresh = cache.get_stale(THEME_INDEX_URL, max_age_seconds=3600)
+            if cached_data is not None:
+                self._load(cached_data)
+                if fresh:
+                    return
+        except Exception as e:
+            print(f"Failed to load cached themes: {e}")
+            cached_data = None
+
+        try:
+            # Progress only matters while there is nothing to show yet
+            # Kept past expiry even without validators: it is what an offline start shows
+            data = fetch_cached(THEME_INDEX_URL, max_age_seconds=3600, max_size=MAX_INDEX_BYTES,
+                                progress=self._report_progress if cached_data is None else None,
+                                keep_stale=True)
+            if data != cached_data:
+                self._load(data)
         except Exception as e:
+            if self._stopping:
+                return
             print(f"Failed to fetch themes: {e}")
-            self.themes_fetched.emit([])
+            if cached_data is None:
+                self.themes_fetched.emit([])
 
+    def _report_progress(self, received, total):
+        # Once per percent, or per 256 KiB when the size is unknown
+        step = received * 100 // total if total else received >> 18
+        if step != self._progress_step and not self._stopping:
+            self._progress_step = step
+            self.download_progress.emit(received, total)
 
-class CoverImageFetcher(QThread):
-    image_loaded = pyqtSignal(bytes)
-    error_occurred = pyqtSignal(str)
+    def _load(self, data):
+        if self._stopping:
+            return
+        if data.lstrip().startswith(b'{'):
+            self.manifest_fetched.emit(parse_manifest(json.loads(data), THEME_INDEX_URL))
+            return
+        # Only the first copy is streamed; a refresh swaps the full list in at once
+        stream, self._streamed = not self._streamed, True
 
-    def __init__(self, image_url: str):
-        super().__init__()
-        self.image_url = image_url
+        digest = hashlib.sha256(data).hexdigest()
+        themes = read_index_snapshot(THEME_INDEX_URL, digest)
+        if themes is None:
+            themes = []
+            for batch in iter_theme_batches(data.decode('utf-8')):
+                themes.extend(batch)
+                if stream:
+                    self.themes_batch.emit(batch)
+            write_index_snapshot(THEME_INDEX_URL, digest, themes)
+        self.themes_fetched.emit(themes)
 
-    def run(self):
+
+# One shard of a sharded index: where it lives and the sha256 of its contents (may be empty)
+IndexShard = namedtuple('IndexShard', ('url', 'sha256'))
+
+
+def parse_manifest(manifest, base_url):
+    """
+    Return the IndexShard list of a sharded index manifest.
+
+    A manifest looks like {"shards": [{"url": ..., "sha256": ...}]}; shard
+    URLs may be relative to the manifest's own URL, and other keys (such as a
+    theme count) are ignored.
+    """
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("shards"), list):
+        raise ValueError("Theme index manifest has no shard list")
+    return [IndexShard(urljoin(base_url, entry["url"]), entry.get("sha256") or "")
+            for entry in manifest["shards"]]
+
+
+def load_shard(shard):
+    """
+    Return the themes of one index shard, from the cache or the network.
+
+    Shards are pinned by the manifest's hash: a cached copy is used for as
+    long as it matches, and one that does not (the shard was republished) is
+    dropped and downloaded again.
+    """
+    local_path = _local_path(shard.url)
+    if local_path is not None:
+        with open(local_path, 'rb') as f:
+            data = f.read()
+    else:
+        data = fetch_cached(shard.url, INDEX_SHARD_TTL, MAX_INDEX_BYTES)
+        if shard.sha256 and hashlib.sha256(data).hexdigest() != shard.sha256:
+            cache.invalidate(shard.url)
+            data = fetch_cached(shard.url, INDEX_SHARD_TTL, MAX_INDEX_BYTES)
+    digest = hashlib.sha256(data).hexdigest()
+    if shard.sha256 and digest != shard.sha256:
+        raise ValueError(f"Index shard does not match its hash: {shard.url}")
+
+    themes = read_index_snapshot(shard.url, digest)
+    if themes is None:
+        themes = [theme for batch in iter_theme_batches(data.decode('utf-8')) for theme in batch]
+        write_index_snapshot(shard.url, digest, themes)
+    return themes
+
+
+def fetch_image_path(image_url):
+    """Return the path of a cached copy of an image, downloading it if needed."""
+    # Images stay fresh for 7 Days / 604800 seconds
+    return fetch_to_cache(image_url, max_age_seconds=604800, max_size=MAX_IMAGE_BYTES)
+
+
+def is_image_cached(image_url):
+    """True if fetch_image_path would be answered from the cache (only the in-memory index is checked)."""
+    return cache.get_path(image_url, max_age_seconds=604800) is not None
+
+
+def fetch_image(image_url):
+    """Return the raw bytes of an image, from the cache or the network."""
+    with open(fetch_image_path(image_url), 'rb') as f:
+        return f.read()
+
+
+def warm_image(image_url):
+    """Make sure an image is in the disk cache without reading it."""
+    fetch_image_path(image_url)
+    return None
+
+
+def decode_image(source, scaled_to=None):
+    """
+    Decode an image file (or bytes) into a QImage; safe to call from worker threads.
+
+    With scaled_to, the image is decoded straight to fit within that QSize, so
+    formats that support it (JPEG) never materialise the full-resolution image.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        buffer = QBuffer()
+        buffer.setData(source)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        reader = QImageReader(buffer)
+    else:
+        reader = QImageReader(source)
+    size = reader.size()
+    if scaled_to is not None and size.isValid() and (
+            size.width() > scaled_to.width() or size.height() > scaled_to.height()):
+        reader.setScaledSize(size.scaled(scaled_to, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Unsupported image data: {reader.errorString()}")
+    return image
+
+
+def display_ready(image):
+    """Convert to the format QPixmap.fromImage can take without another conversion."""
+    if image.hasAlphaChannel():
+        return image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+    return image.convertToFormat(QImage.Format.Format_RGB32)
+
+
+def thumbnail_key(image_url, width, height, device_pixel_ratio):
+    return f"thumbnail:{width}x{height}@{device_pixel_ratio:g}:{image_url}"
+
+
+def load_thumbnail(image_url, width, height, device_pixel_ratio=1.0):
+    """
+    Return a centre-cropped thumbnail of an image as a display-ready QImage.
+
+    Thumbnails are derived once from the full image and cached under their own
+    key (URL, size and pixel ratio), so later loads decode a few KB instead of
+    a full-resolution screenshot. Loads of the same thumbnail that overlap
+    share one derivation.
+    """
+    key = thumbnail_key(image_url, width, height, device_pixel_ratio)
+    cached_thumbnail = cache.get_path(key, max_age_seconds=604800)
+    if cached_thumbnail is not None:
         try:
-            if not self.image_url:
-                self.error_occurred.emit(ERROR_NO_COVER_IMAGE)
-                return
-            
-            # Check cache first (Expires in 7 Days / 604800 seconds)
-            cached_image = cache.get(self.image_url, max_age_seconds=604800)
-            if cached_image:
-                self.image_loaded.emit(cached_image)
-                return
+            return display_ready(decode_image(cached_thumbnail))
+        except ValueError:
+            # Missing or damaged; derive it again
+            cache.invalidate(key)
+    return _flights.do(key, lambda: _derive_thumbnail(key, image_url, width, height, device_pixel_ratio))
 
-            response = requests.get(self.image_url, stream=True, timeout=10)
-            response.raise_for_status()
-            # Save the new image to cache
-            cache.set(self.image_url, response.content)
-            self.image_loaded.emit(response.content)
-        except Exception as e:
-            self.error_occurred.emit(f"Network error: {e}")
 
+def _derive_thumbnail(key, image_url, width, height, device_pixel_ratio):
+    image = decode_image(fetch_image_path(image_url))
+    pixel_width = round(width * device_pixel_ratio)
+    pixel_height = round(height * device_pixel_ratio)
+    scaled = image.scaled(pixel_width, pixel_height,
+                          Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                          Qt.TransformationMode.SmoothTransformation)
+    # Keep only the centred crop that is actually shown
+    thumbnail = scaled.copy((scaled.width() - pixel_width) // 2, (scaled.height() - pixel_height) // 2,
+                            pixel_width, pixel_height)
 
-class CarouselImageFetcher(QThread):
-    images_loaded = pyqtSignal(list)
-    error_occurred = pyqtSignal(str)
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    if thumbnail.hasAlphaChannel() or not thumbnail.save(buffer, "JPEG", 85):
+        buffer.seek(0)
+        thumbnail.save(buffer, "PNG")
+    cache.set(key, bytes(buffer.data()), max_age_seconds=604800)
+    return display_ready(thumbnail)
 
-    def __init__(self, image_urls: list):
-        super().__init__()
-        self.image_urls = image_urls
+
+def load_scaled_image(image_url, width, height, device_pixel_ratio=1.0):
+    """Return an image scaled down to fit width x height as a display-ready QImage."""
+    target = QSize(round(width * device_pixel_ratio), round(height * device_pixel_ratio))
+    return display_ready(decode_image(fetch_image_path(image_url), scaled_to=target))
+
+
+class ImageRequest:
+    """Handle for a request (an image or an index shard) queued on the ImageFetchPool."""
+    __slots__ = ('url', 'loader', 'priority', 'on_loaded', 'on_error', 'started', 'cancelled')
+
+    def __init__(self, url, loader, priority, on_loaded, on_error):
+        self.url = url
+        self.loader = loader
+        self.priority = priority
+        self.on_loaded = on_loaded
+        self.on_error = on_error
+        self.started = False
+        self.cancelled = False
+
+
+class _FetchWorker(threading.Thread):
+    # A daemon Python thread rather than a QThread: on shutdown a download in
+    # flight is simply abandoned, where a still-running QThread would have to be
+    # waited for (up to the read timeout) or killed when the app exits
+    def __init__(self, pool):
+        super().__init__(name="fetch-worker", daemon=True)
+        self.pool = pool
 
     def run(self):
-        image_bytes_list = []
-        for url in self.image_urls:
+        while True:
+            request = self.pool._take_next()
+            if request is None:
+                return
             try:
-                # Check cache first (Expires in 7 Days / 604800 seconds)
-                cached_image = cache.get(url, max_age_seconds=604800)
-                if cached_image:
-                    image_bytes_list.append(cached_image)
-                else:
-                    response = requests.get(url, stream=True, timeout=10)
-                    response.raise_for_status()
-                    cache.set(url, response.content)
-                    image_bytes_list.append(response.content)
+                data = request.loader(request.url)
+                error = ""
             except Exception as e:
-                print(f"Failed to load carousel image {url}: {e}")
-                
-        if image_bytes_list:
-            self.images_loaded.emit(image_bytes_list)
+                # Not necessarily the network: a bad image or a shard failing its hash check end up here too
+                data, error = b"", str(e) or type(e).__name__
+            if self.pool._stopping:
+                return
+            self.pool._request_done.emit(request, data, error)
+
+
+class ImageFetchPool(QObject):
+    """
+    A fixed set of worker threads shared by every image download and index
+    shard load.
+
+    Requests are served lowest priority value first, can be reprioritized while
+    queued (e.g. when a card scrolls into view) and cancelled when their card
+    or shard is no longer wanted. Callbacks always run on the thread that owns
+    the pool; on_error gets the reason the loader failed.
+    """
+    _request_done = pyqtSignal(object, object, str)
+
+    def __init__(self, max_workers=IMAGE_FETCH_WORKERS):
+        super().__init__()
+        self._queue = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._request_done.connect(self._deliver)
+        self._workers = [_FetchWorker(self) for _ in range(max(1, max_workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def request(self, url, on_loaded, on_error, priority=PRIORITY_VISIBLE, loader=fetch_image):
+        """Queue loader(url) (a download by default) and return its ImageRequest handle."""
+        request = ImageRequest(url, loader, priority, on_loaded, on_error)
+        if not url:
+            request.cancelled = True
+            on_error(ERROR_NO_COVER_IMAGE)
+            return request
+        with self._condition:
+            self._push(request)
+            self._condition.notify()
+        return request
+
+    def reprioritize(self, request, priority):
+        """Move a still-queued request to a new priority."""
+        with self._condition:
+            if request.started or request.cancelled or request.priority == priority:
+                return
+            request.priority = priority
+            self._push(request)
+
+    def cancel(self, request):
+        """Drop a request; its callbacks will not be called."""
+        if request is not None:
+            request.cancelled = True
+
+    def shutdown(self):
+        """
+        Stop the workers, abandoning anything still queued.
+
+        Does not wait: idle workers exit at once, and one in the middle of a
+        download exits when it finishes (or with the process), without
+        delivering the result.
+        """
+        with self._condition:
+            self._stopping = True
+            self._queue.clear()
+            self._condition.notify_all()
+
+    def _push(self, request):
+        # Superseded heap entries are skipped when popped; compact once they pile up
+        if len(self._queue) > 1024:
+            self._queue = [e for e in self._queue if self._is_live(e)]
+            heapq.heapify(self._queue)
+        heapq.heappush(self._queue, (request.priority, next(self._order), request))
+
+    @staticmethod
+    def _is_live(entry):
+        priority, _, request = entry
+        return not request.started and not request.cancelled and request.priority == priority
+
+    def _take_next(self):
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+                while self._queue:
+                    entry = heapq.heappop(self._queue)
+                    if self._is_live(entry):
+                        entry[2].started = True
+                        return entry[2]
+                self._condition.wait()
+
+    def _deliver(self, request, data, error):
+        if request.cancelled:
+            return
+        if error:
+            request.on_error(error)
         else:
-            self.error_occurred.emit("Failed to load any carousel images.")
+            request.on_loaded(data)
+
+
+_image_pool = None
+
+def get_image_pool():
+    """Return the process-wide ImageFetchPool, creating it on first use."""
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ImageFetchPool()
+    return _image_pool
+
+def shutdown_image_pool():
+    """Shut the ImageFetchPool down, if one was ever started."""
+    if _image_pool is not None:
+        _image_pool.shutdown()
+
+
+class ShardedThemeIndex(QObject):
+    """
+    The themes of a sharded index, loaded shard by shard on demand.
+
+    load_next() asks for one more shard (the grid calls it as it is scrolled
+    towards the end of what is loaded) and load_all() for every remaining one
+    (a search needs the whole catalog). Shards are downloaded on the shared
+    ImageFetchPool, possibly several at once, but shard_loaded is always
+    emitted in manifest order so rows keep a stable position.
+    """
+    shard_loaded = pyqtSignal(list)
+
+    def __init__(self, shards, pool=None):
+        super().__init__()
+        self.shards = list(shards)
+        self.pool = pool or get_image_pool()
+        self._requests = {}
+        self._arrived = {}
+        self._requested = 0
+        self._emitted = 0
+
+    def has_more(self):
+        """True while some shard has not been asked for yet."""
+        return self._requested < len(self.shards)
+
+    def is_complete(self):
+        return self._emitted == len(self.shards)
+
+    def load_next(self):
+        # One shard at a time: the next is only requested once the last one arrived
+        if self._requested == self._emitted:
+            self._request_up_to(self._requested + 1)
+
+    def load_all(self):
+        self._request_up_to(len(self.shards))
+
+    def cancel(self):
+        for request in self._requests.values():
+            self.pool.cancel(request)
+        self._requests.clear()
+        self._requested = self._emitted = len(self.shards)
+
+    def _request_up_to(self, end):
+        for position in range(self._requested, min(end, len(self.shards))):
+            self._requests[position] = self.pool.request(
+                self.shards[position].url,
+                lambda themes, p=position: self._arrive(p, themes),
+                lambda message, p=position: self._failed(p, message),
+                PRIORITY_VISIBLE,
+                loader=lambda _, shard=self.shards[position]: load_shard(shard))
+            self._requested = position + 1
+
+    def _failed(self, position, message):
+        print(f"Failed to load index shard {self.shards[position].url}: {message}")
+        self._arrive(position, [])
+
+    def _arrive(self, position, themes):
+        self._requests.pop(position, None)
+        self._arrived[position] = themes
+        while self._emitted in self._arrived:
+            self.shard_loaded.emit(self._arrived.pop(self._emitted))
+            self._emitted += 1
+
+
+class Prefetcher(QObject):
+    """
+    Warms the disk cache with preview screenshots the user is likely to open next.
+
+    Work is fed to the shared ImageFetchPool at PRIORITY_PREFETCH, below every
+    on-demand request, and at most PREFETCH_MAX_IN_FLIGHT jobs are handed to
+    the pool at once so prefetching never occupies more than a few workers.
+    The most recently requested theme is served first. Images with a fresh
+    copy in the cache are skipped, so one that was evicted or expired is
+    prefetched again.
+    """
+
+    def __init__(self, pool=None):
+        super().__init__()
+        # The shared pool is only started once there is something to prefetch
+        self._pool = pool
+        self._queue = deque(maxlen=PREFETCH_MAX_QUEUED)
+        self._in_flight = {}
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = get_image_pool()
+        return self._pool
+
+    def prefetch_theme(self, theme):
+        urls = [url for url in theme.carousel_images[:PREFETCH_SLIDES_PER_THEME] if url]
+        # Newest first: push in reverse so the first slide ends up at the front
+        for url in reversed(urls):
+            if url in self._in_flight or is_image_cached(url):
+                continue
+            if url in self._queue:
+                self._queue.remove(url)
+            self._queue.appendleft(url)
+        self._pump()
+
+    def clear(self):
+        self._queue.clear()
+        for request in self._in_flight.values():
+            self.pool.cancel(request)
+        self._in_flight.clear()
+
+    def _pump(self):
+        while self._queue and len(self._in_flight) < PREFETCH_MAX_IN_FLIGHT:
+            url = self._queue.popleft()
+            self._in_flight[url] = self.pool.request(
+                url,
+                lambda _, u=url: self._finished(u),
+                lambda message, u=url: self._finished(u),
+                PRIORITY_PREFETCH,
+                loader=warm_image)
+
+    def _finished(self, url):
+        self._in_flight.pop(url, None)
+        self._pump()
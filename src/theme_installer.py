@@ -1,11 +1,129 @@
 import sys
 import os
+import json
 import shutil
+import threading
 import subprocess
+from collections import namedtuple
 from PyQt6.QtCore import QThread, pyqtSignal
 import time
 from constants import ERROR_INSTALLATION_FAILED, ERROR_GRUB_UPDATE_FAILED
 
+INSTALLER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'privileged_installer.py')
+
+# One theme (or size of a theme) to install; theme_name is its directory under the GRUB themes dir
+InstallJob = namedtuple("InstallJob", "theme_name repo_link branch_name")
+
+
+def _failure_message(code, details):
+    # Exit code 2 (or helper error code 2) means only the GRUB update failed
+    if code == 2:
+        return f"{ERROR_GRUB_UPDATE_FAILED}\n\nDetails:\n{details}"
+    return f"{ERROR_INSTALLATION_FAILED}\n\nDetails:\n{details}"
+
+
+class HelperError(Exception):
+    """A request to the privileged helper failed; code follows the installer's exit codes."""
+
+    def __init__(self, message, code=1):
+        super().__init__(message)
+        self.code = code
+
+
+class PrivilegedHelper:
+    """
+    Client for a long-lived `privileged_installer.py --serve` process.
+
+    The helper is started on the first call (the session's one authentication
+    prompt) and kept for the calls after it, which then skip pkexec and the
+    interpreter start. It exits by itself once idle, and is started again on
+    the next call. Calls are serialised; they block, so make them from a thread.
+    """
+
+    def __init__(self, command=None):
+        # The command can be swapped for a non-root stand-in pointed at temp directories
+        self.command = command or ['pkexec', 'python3', INSTALLER_SCRIPT, '--serve']
+        self.process = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def call(self, method, params=None, on_event=None):
+        """Run one request; on_event receives its progress events. Returns the result or raises HelperError."""
+        with self._lock:
+            for attempt in range(2):
+                if self.process is None or self.process.poll() is not None:
+                    self.process = subprocess.Popen(
+                        self.command,
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True
+                    )
+                self._next_id += 1
+                request_id = self._next_id
+                events = 0
+                try:
+                    self.process.stdin.write(json.dumps({"id": request_id, "method": method, "params": params or {}}) + "\n")
+                    self.process.stdin.flush()
+                    for line in self.process.stdout:
+                        try:
+                            message = json.loads(line)
+                        except ValueError:
+                            continue
+                        if message.get("id") != request_id:
+                            continue
+                        if "event" in message:
+                            events += 1
+                            if on_event:
+                                on_event(message)
+                        elif "error" in message:
+                            raise HelperError(message["error"], message.get("code", 1))
+                        else:
+                            return message.get("result")
+                except BrokenPipeError:
+                    pass
+
+                # The helper went away without answering
+                returncode = self.process.wait()
+                stderr_output = self.process.stderr.read().strip()
+                self.process = None
+                # A clean exit is the idle timeout, just as the request went out; start a new helper
+                if returncode != 0 or events or attempt:
+                    raise HelperError(f"The privileged helper exited unexpectedly (code {returncode}).\n{stderr_output}")
+
+    def install(self, theme_name, repo_link, branch_name, on_event=None):
+        return self.call("install", {"theme": theme_name, "repo": repo_link, "branch": branch_name}, on_event)
+
+    def install_batch(self, jobs, activate=None, on_event=None):
+        params = {"jobs": [{"theme": job.theme_name, "repo": job.repo_link, "branch": job.branch_name} for job in jobs]}
+        if activate is not None:
+            params["activate"] = activate
+        return self.call("install_batch", params, on_event)
+
+    def activate(self, theme_name, on_event=None):
+        return self.call("activate", {"theme": theme_name}, on_event)
+
+    def remove(self, theme_name, on_event=None):
+        return self.call("remove", {"theme": theme_name}, on_event)
+
+    def close(self):
+        """Let the helper exit once it has finished what it is doing."""
+        process = self.process
+        if process is not None and process.poll() is None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+
+_helper = None
+
+def get_privileged_helper():
+    global _helper
+    if _helper is None:
+        _helper = PrivilegedHelper()
+    return _helper
+
 class ThemeInstaller(QThread):
     """
     Thread for installing a GRUB theme as a privileged user.
@@ -14,22 +132,27 @@ class ThemeInstaller(QThread):
     progress_updated = pyqtSignal(int, str)
     installation_completed = pyqtSignal(bool, str)
     
-    def __init__(self, theme_name: str, repo_link: str, branch_name: str):
+    def __init__(self, theme_name: str, repo_link: str, branch_name: str, helper=None):
         super().__init__()
         self.theme_name = theme_name
         self.repo_link = repo_link
         self.branch_name = branch_name
+        # A PrivilegedHelper to send the install to, instead of starting pkexec for it
+        self.helper = helper
         self.process = None
 
     def run(self):
         """
         Executes the privileged installer script with pkexec.
         """
+        if self.helper is not None:
+            self._run_with_helper()
+            return
         try:
             # Use pkexec to run the privileged script with root permissions
             # We pass the theme name and repo link as command-line arguments
             self.process = subprocess.Popen(
-                ['pkexec', 'python3', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'privileged_installer.py'), self.theme_name, self.repo_link, self.branch_name],
+                ['pkexec', 'python3', INSTALLER_SCRIPT, self.theme_name, self.repo_link, self.branch_name],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True
@@ -53,17 +176,124 @@ class ThemeInstaller(QThread):
                 self.installation_completed.emit(True, f"Theme '{self.theme_name}' installed successfully.")
             else:
                 stderr_output = self.process.stderr.read().strip()
-                if self.process.returncode == 2:
-                    self.installation_completed.emit(False, f"{ERROR_GRUB_UPDATE_FAILED}\n\nDetails:\n{stderr_output}")
-                else:
-                    self.installation_completed.emit(False, f"{ERROR_INSTALLATION_FAILED}\n\nDetails:\n{stderr_output}")
+                self.installation_completed.emit(False, _failure_message(self.process.returncode, stderr_output))
                     
         except FileNotFoundError:
             self.installation_completed.emit(False, "The 'pkexec' command was not found. Please ensure PolicyKit is installed.")
         except Exception as e:
             self.installation_completed.emit(False, f"An unexpected error occurred during installation: {e}")
+
+    def _run_with_helper(self):
+        def on_event(event):
+            if event["event"] == "progress":
+                self.progress_updated.emit(event["percentage"], event["message"])
+
+        try:
+            message = self.helper.install(self.theme_name, self.repo_link, self.branch_name, on_event)
+            self.installation_completed.emit(True, message)
+        except HelperError as e:
+            self.installation_completed.emit(False, _failure_message(e.code, str(e)))
+        except FileNotFoundError:
+            self.installation_completed.emit(False, "The 'pkexec' command was not found. Please ensure PolicyKit is installed.")
+        except Exception as e:
+            self.installation_completed.emit(False, f"An unexpected error occurred during installation: {e}")
+
+
+class BatchThemeInstaller(QThread):
+    """
+    Thread for installing several themes in one privileged session.
+
+    Costs one authentication prompt and one GRUB update however many jobs
+    there are; the themes are fetched concurrently. `activate` is the theme
+    GRUB is pointed at afterwards (the last job's by default).
+    """
+    progress_updated = pyqtSignal(int, str)
+    # (job index, percentage, message)
+    job_progress = pyqtSignal(int, int, str)
+    # (job index, succeeded, message)
+    job_completed = pyqtSignal(int, bool, str)
+    installation_completed = pyqtSignal(bool, str)
+
+    def __init__(self, jobs, activate=None, helper=None):
+        super().__init__()
+        self.jobs = [InstallJob(*job) for job in jobs]
+        if not self.jobs:
+            raise ValueError("BatchThemeInstaller needs at least one job")
+        self.activate = activate if activate is not None else self.jobs[-1].theme_name
+        if self.activate not in (job.theme_name for job in self.jobs):
+            raise ValueError(f"'{self.activate}' is not one of the themes being installed")
+        self.helper = helper
+        self.process = None
+
+    def run(self):
+        if self.helper is not None:
+            self._run_with_helper()
+            return
+        request = {
+            "jobs": [{"theme": job.theme_name, "repo": job.repo_link, "branch": job.branch_name} for job in self.jobs],
+            "activate": self.activate,
+        }
+        try:
+            self.process = subprocess.Popen(
+                ['pkexec', 'python3', INSTALLER_SCRIPT, '--batch'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            self.process.stdin.write(json.dumps(request))
+            self.process.stdin.close()
+
+            for line in self.process.stdout:
+                try:
+                    kind, rest = line.rstrip("\n").split(":", 1)
+                    if kind == "PROGRESS":
+                        percentage, message = rest.split(":", 1)
+                        self.progress_updated.emit(int(percentage), message)
+                    elif kind == "JOB":
+                        index, percentage, message = rest.split(":", 2)
+                        self.job_progress.emit(int(index), int(percentage), message)
+                    elif kind == "JOB_DONE":
+                        index, status, message = rest.split(":", 2)
+                        self.job_completed.emit(int(index), status == "ok", message)
+                except (ValueError, IndexError):
+                    # Ignore malformed progress lines
+                    continue
+
+            self.process.wait()
+
+            if self.process.returncode == 0:
+                self.installation_completed.emit(True, f"{len(self.jobs)} themes installed successfully.")
+            else:
+                stderr_output = self.process.stderr.read().strip()
+                self.installation_completed.emit(False, _failure_message(self.process.returncode, stderr_output))
+
+        except FileNotFoundError:
+            self.installation_completed.emit(False, "The 'pkexec' command was not found. Please ensure PolicyKit is installed.")
+        except Exception as e:
+            self.installation_completed.emit(False, f"An unexpected error occurred during installation: {e}")
+
+    def _run_with_helper(self):
+        def on_event(event):
+            if event["event"] == "progress":
+                self.progress_updated.emit(event["percentage"], event["message"])
+            elif event["event"] == "job":
+                self.job_progress.emit(event["index"], event["percentage"], event["message"])
+            elif event["event"] == "job_done":
+                self.job_completed.emit(event["index"], event["ok"], event["message"])
+
+        try:
+            message = self.helper.install_batch(self.jobs, self.activate, on_event)
+            self.installation_completed.emit(True, message)
+        except HelperError as e:
+            self.installation_completed.emit(False, _failure_message(e.code, str(e)))
+        except FileNotFoundError:
+            self.installation_completed.emit(False, "The 'pkexec' command was not found. Please ensure PolicyKit is installed.")
+        except Exception as e:
+            self.installation_completed.emit(False, f"An unexpected error occurred during installation: {e}")
             
 
+
 class PrivilegedInstaller(QThread):
     """
     A class that runs the installation script with elevated privileges.
@@ -0,0 +1,195 @@
+import re
+import threading
+import unicodedata
+from PyQt6.QtCore import QThread, pyqtSignal
+from models import author_name
+
+# Relative weight of a match in each searchable field
+NAME_WEIGHT = 3.0
+AUTHOR_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Minimum trigram similarity for a misspelt word to still count as a match
+FUZZY_THRESHOLD = 0.45
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    """Casefold and strip accents so "Café" and "cafe" compare equal."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def _trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def _padded_trigrams(word):
+    return _trigrams(f"  {word} ")
+
+
+class ThemeSearchIndex:
+    """
+    Inverted index over theme name, author and description.
+
+    Every word is indexed under its padded trigrams, so a query word matches
+    indexed words that equal it, start with it, contain it, or (when nothing
+    else matches) are close misspellings of it.
+    """
+
+    def __init__(self, themes):
+        self.themes = list(themes)
+        self.names = []
+        self._word_docs = {}
+        self._trigram_words = {}
+
+        fields = ((NAME_WEIGHT, lambda t: t.name),
+                  (AUTHOR_WEIGHT, lambda t: author_name(t, "")),
+                  (DESCRIPTION_WEIGHT, lambda t: t.description))
+        for doc, theme in enumerate(self.themes):
+            self.names.append(normalize(theme.name))
+            for weight, getter in fields:
+                for word in _WORD_RE.findall(normalize(getter(theme))):
+                    docs = self._word_docs.setdefault(word, {})
+                    if docs.get(doc, 0) < weight:
+                        docs[doc] = weight
+
+        for word in self._word_docs:
+            for gram in _padded_trigrams(word):
+                self._trigram_words.setdefault(gram, set()).add(word)
+        self._sorted_words = sorted(self._word_docs)
+
+    def search(self, query):
+        """Return the matching themes, best match first."""
+        phrase = normalize(query).strip()
+        terms = _WORD_RE.findall(phrase)
+        if not terms:
+            return list(self.themes)
+
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for word, quality in self._match_word(term):
+                for doc, weight in self._word_docs[word].items():
+                    score = quality * weight
+                    if score > term_scores.get(doc, 0):
+                        term_scores[doc] = score
+            # Every query word has to match somewhere
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc: s + term_scores[doc] for doc, s in scores.items() if doc in term_scores}
+            if not scores:
+                return []
+
+        for doc in scores:
+            name = self.names[doc]
+            if name.startswith(phrase):
+                scores[doc] += 5
+            elif phrase in name:
+                scores[doc] += 2
+
+        ranked = sorted(scores, key=lambda doc: (-scores[doc], doc))
+        return [self.themes[doc] for doc in ranked]
+
+    def _match_word(self, term):
+        """Return (word, quality) pairs for indexed words matching one query word."""
+        matches = []
+        if len(term) < 3:
+            # Too short for trigrams, fall back to a substring scan of the vocabulary
+            for word in self._sorted_words:
+                if term in word:
+                    matches.append((word, 3.0 if word == term else 2.0 if word.startswith(term) else 1.0))
+            return matches
+
+        candidates = None
+        for gram in _trigrams(term):
+            words = self._trigram_words.get(gram)
+            if not words:
+                candidates = set()
+                break
+            candidates = set(words) if candidates is None else candidates & words
+        for word in candidates or ():
+            if word == term:
+                matches.append((word, 3.0))
+            elif word.startswith(term):
+                matches.append((word, 2.0))
+            elif term in word:
+                matches.append((word, 1.0))
+        if matches:
+            return matches
+
+        # Nothing contains the term, so look for words sharing most of its trigrams
+        query_grams = _padded_trigrams(term)
+        shared = {}
+        for gram in query_grams:
+            for word in self._trigram_words.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        for word, count in shared.items():
+            similarity = 2.0 * count / (len(query_grams) + len(word) + 1)
+            if similarity >= FUZZY_THRESHOLD:
+                matches.append((word, similarity))
+        return matches
+
+
+class ThemeSearchWorker(QThread):
+    """
+    Background thread that owns the search index and answers queries.
+
+    Only the most recent query is ever run; results carry the generation
+    number returned by submit() so stale answers can be ignored.
+    """
+    results_ready = pyqtSignal(int, list)
+
+    def __init__(self):
+        super().__init__()
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._pending_themes = None
+        self._pending_query = None
+        self._stopping = False
+        self.index = ThemeSearchIndex([])
+
+    def set_themes(self, themes):
+        """Rebuild the index for a new theme list."""
+        with self._condition:
+            self._pending_themes = list(themes)
+            self._condition.notify()
+
+    def submit(self, query):
+        """Queue a query, replacing any that has not started yet."""
+        with self._condition:
+            self._generation += 1
+            self._pending_query = (self._generation, query)
+            self._condition.notify()
+            return self._generation
+
+    def cancel(self):
+        """Drop any queued query and invalidate results still in flight."""
+        with self._condition:
+            self._generation += 1
+            self._pending_query = None
+            return self._generation
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._stopping and self._pending_themes is None and self._pending_query is None:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                themes, self._pending_themes = self._pending_themes, None
+                job, self._pending_query = self._pending_query, None
+
+            if themes is not None:
+                self.index = ThemeSearchIndex(themes)
+            if job is not None:
+                generation, query = job
+                self.results_ready.emit(generation, self.index.search(query))
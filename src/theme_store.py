@@ -0,0 +1,300 @@
+import os
+import re
+import time
+import fcntl
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import subprocess
+import urllib.request
+from contextlib import contextmanager
+
+# Runs inside the privileged installer: standard library only.
+
+
+def test_override(name):
+    """
+    Value of an override for running the installer by hand, unprivileged,
+    against test repositories, fixture files and a stub mkconfig.
+
+    Ignored as root: a launcher that keeps the caller's environment (sudo -E)
+    must not let it choose what the installer runs or writes to.
+    """
+    if os.geteuid() == 0:
+        return None
+    return os.environ.get(name) or None
+
+
+# Root of the store
+STORE_DIR = test_override("GRUBDECK_STORE_DIR") or "/var/cache/grubdeck/store"
+# Stored commits kept per repository, so switching back to a recent version stays local
+KEEP_PER_REPO = 3
+# Timeout for archive downloads, in seconds
+ARCHIVE_TIMEOUT = 60
+# Top-level paths of a theme repository that GRUB never reads (screenshots for
+# READMEs and the like); sparse checkouts leave them, and their blobs, behind
+SPARSE_EXCLUDE = (".github/", "screenshots/", "screenshot/", "preview/", "previews/")
+
+_GITHUB_REPO_RE = re.compile(r"^https://github\.com/([\w.-]+)/([\w.-]+?)(?:\.git)?/?$")
+_COMMIT_RE = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+# Never let git stop and wait for credentials on a terminal nobody is watching.
+# As root git gets a clean environment, for the same reason as test_override:
+# variables such as GIT_SSH_COMMAND or GIT_CONFIG_* would run commands as root
+_GIT_ENV = dict(os.environ if os.geteuid() != 0 else {"PATH": "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"},
+                GIT_TERMINAL_PROMPT="0")
+
+
+class ThemeStore:
+    """
+    Content-addressed store of theme source trees.
+
+    Every tree is kept under the repository it came from and the commit it was
+    checked out at, without its .git directory:
+
+        <root>/trees/<repo key>/<commit>/
+        <root>/refs/<repo + branch key>      last commit installed from that branch
+        <root>/mirrors/<repo key>.git        blobless bare mirror of the repository
+
+    A tree is written once and never changed, so installing a theme (or size)
+    whose current commit is already stored is a local copy. New commits are
+    fetched into the repository's mirror, which only ever downloads what it does
+    not have yet: commits and trees up front, and file contents only when a
+    sparse checkout (without SPARSE_EXCLUDE) needs them. Sizes that are branches
+    of one repository therefore share everything they have in common. If git
+    fails, GitHub repositories fall back to a tarball of the commit.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def checkout(self, repo_link, branch, progress=None, prune=True):
+        """
+        Return the stored tree for the branch's current commit, fetching it if it is new.
+
+        With prune=False the repository's older trees are left alone; callers
+        checking out several trees at once prune when they are all deployed.
+        """
+        progress = progress or (lambda percentage, message: None)
+        if repo_link.startswith('-') or branch.startswith('-'):
+            raise ValueError(f"Refusing suspicious repository or branch name: {repo_link} {branch}")
+
+        progress(15, "Checking for theme updates...")
+        commit = self.resolve(repo_link, branch)
+        if commit is None:
+            # The remote could not be asked (offline?); the last tree installed from it will do
+            commit = self._read_ref(repo_link, branch)
+            if commit is not None and not os.path.isdir(self.tree_path(repo_link, commit)):
+                commit = None
+
+        if commit is not None and os.path.isdir(self.tree_path(repo_link, commit)):
+            progress(40, "Using stored copy of the theme.")
+            path = self.tree_path(repo_link, commit)
+            # Mark it recently used for pruning
+            os.utime(path)
+        else:
+            path = self._fetch(repo_link, branch, commit, progress)
+            commit = os.path.basename(path)
+
+        self._write_ref(repo_link, branch, commit)
+        if prune:
+            self.prune(repo_link, keep=[path])
+        return path
+
+    def resolve(self, repo_link, branch):
+        """Return the commit the remote branch points at, or None if it cannot be asked."""
+        try:
+            result = subprocess.run(
+                ['git', 'ls-remote', repo_link, f"refs/heads/{branch}"],
+                check=True, capture_output=True, text=True, timeout=30, env=_GIT_ENV)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        for line in result.stdout.splitlines():
+            commit = line.split('\t', 1)[0].strip()
+            if _COMMIT_RE.match(commit):
+                return commit
+        return None
+
+    def tree_path(self, repo_link, commit):
+        return os.path.join(self.root, "trees", _key(_normalize(repo_link)), commit)
+
+    def mirror_path(self, repo_link):
+        return os.path.join(self.root, "mirrors", _key(_normalize(repo_link)) + ".git")
+
+    def _fetch(self, repo_link, branch, commit, progress):
+        repo_dir = os.path.dirname(self.tree_path(repo_link, "x"))
+        os.makedirs(repo_dir, mode=0o755, exist_ok=True)
+        # Build next to the final location so moving it into place is a single rename
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=repo_dir)
+        try:
+            tree = os.path.join(staging, "tree")
+            try:
+                commit = self._checkout_from_mirror(repo_link, branch, commit, tree, progress)
+            except (OSError, subprocess.SubprocessError):
+                # No git, or it could not get through; GitHub also serves plain archives
+                github = _GITHUB_REPO_RE.match(_normalize(repo_link))
+                if commit is None or not github:
+                    raise
+                shutil.rmtree(tree, ignore_errors=True)
+                progress(20, "Downloading theme archive...")
+                self._download_archive(github.group(1), github.group(2), commit, tree)
+
+            os.chmod(tree, 0o755)
+            path = os.path.join(repo_dir, commit)
+            try:
+                os.rename(tree, path)
+            except OSError:
+                # Another install stored the same commit first; theirs is identical
+                if not os.path.isdir(path):
+                    raise
+            progress(40, "Theme downloaded.")
+            return path
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _checkout_from_mirror(self, repo_link, branch, commit, dest, progress):
+        mirror = self.mirror_path(repo_link)
+        os.makedirs(os.path.dirname(mirror), mode=0o755, exist_ok=True)
+        with _locked(mirror + ".lock"):
+            if not os.path.isdir(mirror):
+                progress(20, "Fetching theme repository...")
+                self._create_mirror(repo_link, branch, mirror)
+            elif commit is None or not _has_commit(mirror, commit):
+                progress(20, "Fetching theme updates...")
+                _git('--git-dir', mirror, 'fetch', '--quiet', '--filter=blob:none', '--no-tags',
+                     'origin', f"+refs/heads/{branch}:refs/heads/{branch}")
+                _git('--git-dir', mirror, 'gc', '--auto', '--quiet')
+            if commit is None or not _has_commit(mirror, commit):
+                # Unknown up front, or the branch moved since it was resolved
+                commit = _git('--git-dir', mirror, 'rev-parse', '--verify', f"refs/heads/{branch}^{{commit}}")
+            if not _COMMIT_RE.match(commit):
+                raise ValueError(f"Unexpected commit id from git: {commit!r}")
+
+            progress(30, "Checking out theme files...")
+            os.makedirs(dest, mode=0o755)
+            # A private index keeps concurrent checkouts from the same mirror apart;
+            # missing file contents are fetched in one batch as the checkout needs them
+            env = dict(_GIT_ENV, GIT_INDEX_FILE=os.path.join(os.path.dirname(dest), "index"))
+            _git('--git-dir', mirror, '--work-tree', dest, '-c', 'core.sparseCheckout=true',
+                 'read-tree', '--reset', '-u', commit, env=env)
+        return commit
+
+    def _create_mirror(self, repo_link, branch, mirror):
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(mirror))
+        try:
+            tmp_mirror = os.path.join(staging, "mirror.git")
+            _git('clone', '--quiet', '--bare', '--filter=blob:none', '--no-tags', '--single-branch',
+                 '-b', branch, '--', repo_link, tmp_mirror)
+            with open(os.path.join(tmp_mirror, "info", "sparse-checkout"), 'w') as f:
+                f.write("/*\n")
+                f.writelines(f"!/{path}\n" for path in SPARSE_EXCLUDE)
+            os.rename(tmp_mirror, mirror)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _download_archive(self, owner, repo, commit, dest):
+        url = f"https://codeload.github.com/{owner}/{repo}/tar.gz/{commit}"
+        request = urllib.request.Request(url, headers={"User-Agent": "grubdeck"})
+        with urllib.request.urlopen(request, timeout=ARCHIVE_TIMEOUT) as response:
+            with tarfile.open(fileobj=response, mode="r|gz") as archive:
+                _extract_tree(archive, dest)
+
+    def _ref_path(self, repo_link, branch):
+        return os.path.join(self.root, "refs", _key(f"{_normalize(repo_link)}\n{branch}"))
+
+    def _read_ref(self, repo_link, branch):
+        try:
+            with open(self._ref_path(repo_link, branch)) as f:
+                commit = f.read().strip()
+        except OSError:
+            return None
+        return commit if _COMMIT_RE.match(commit) else None
+
+    def _write_ref(self, repo_link, branch, commit):
+        path = self._ref_path(repo_link, branch)
+        os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(commit + "\n")
+        os.replace(tmp_path, path)
+
+    def prune(self, repo_link, keep):
+        """Drop the repository's least recently used trees, never those in keep."""
+        keep = set(keep)
+        repo_dir = os.path.dirname(self.tree_path(repo_link, "x"))
+        trees = []
+        for name in os.listdir(repo_dir):
+            path = os.path.join(repo_dir, name)
+            if path in keep:
+                continue
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            # Leftovers of an interrupted fetch are dropped once they are clearly stale
+            if name.startswith(".tmp-"):
+                if time.time() - mtime > 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            trees.append((mtime, path))
+        trees.sort(reverse=True)
+        for _, path in trees[max(KEEP_PER_REPO - len(keep), 0):]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _git(*args, env=None):
+    return subprocess.run(['git', *args], check=True, capture_output=True, text=True,
+                          env=env or _GIT_ENV).stdout.strip()
+
+
+def _has_commit(mirror, commit):
+    # Compared against branch tips rather than looked up: in a partial clone a
+    # lookup of a missing object silently fetches it from the remote
+    tips = _git('--git-dir', mirror, 'for-each-ref', '--format=%(objectname)', 'refs/heads/')
+    return commit in tips.split()
+
+
+@contextmanager
+def _locked(path):
+    # Serialises fetches into one mirror between concurrent installers
+    with open(path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _normalize(repo_link):
+    return repo_link.strip().rstrip('/')
+
+
+def _key(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def _extract_tree(archive, dest):
+    """
+    Extract a GitHub tarball into dest, dropping its top-level "<repo>-<commit>/" directory.
+
+    Only regular files and directories are written, and only inside dest;
+    links, devices and anything trying to escape are skipped.
+    """
+    os.makedirs(dest, mode=0o755)
+    root = os.path.realpath(dest)
+    for member in archive:
+        parts = member.name.split('/', 1)
+        if len(parts) < 2 or not parts[1]:
+            continue
+        target = os.path.realpath(os.path.join(root, parts[1]))
+        if not target.startswith(root + os.sep):
+            continue
+        if member.isdir():
+            os.makedirs(target, mode=0o755, exist_ok=True)
+        elif member.isfile():
+            os.makedirs(os.path.dirname(target), mode=0o755, exist_ok=True)
+            source = archive.extractfile(member)
+            with open(target, 'wb') as f:
+                shutil.copyfileobj(source, f)
+            os.chmod(target, 0o755 if member.mode & 0o111 else 0o644)
@@ -1,12 +1,16 @@
+import time
 from PyQt6.QtWidgets import (QDialog, QProgressBar, QLabel, QPushButton, 
                              QFrame, QVBoxLayout, QWidget, QStackedWidget, QHBoxLayout,
-                             QGraphicsDropShadowEffect, QApplication)
-from PyQt6.QtGui import QFont, QPixmap, QColor
-from PyQt6.QtCore import Qt, QSize, QMargins
+                             QApplication, QListView, QStyledItemDelegate, QStyle, QSizePolicy)
+from PyQt6.QtGui import QFont, QFontMetrics, QPixmap, QColor, QPainter, QPainterPath, QPen
+from PyQt6.QtCore import Qt, QSize, QMargins, QRectF, QTimer, QAbstractListModel, QModelIndex, pyqtSignal
 
-from constants import PROGRESS_DIALOG_WIDTH, PROGRESS_DIALOG_HEIGHT, ERROR_NO_COVER_IMAGE
-from models import Theme
-from theme_fetcher import CoverImageFetcher
+from constants import (PROGRESS_DIALOG_WIDTH, PROGRESS_DIALOG_HEIGHT, ERROR_NO_COVER_IMAGE,
+                       CARD_WIDTH, CARD_HEIGHT, CARD_IMAGE_HEIGHT, CARD_SPACING,
+                       PRIORITY_PREVIEW, PRIORITY_VISIBLE, PRIORITY_OFFSCREEN, COVER_RETRY_INTERVAL)
+from models import Theme, author_name
+from theme_fetcher import get_image_pool, load_thumbnail, load_scaled_image
+from image_cache import cover_key, carousel_key, find_pixmap, insert_pixmap
 
 class InstallationProgressDialog(QDialog):
     def __init__(self, parent=None):
@@ -42,90 +46,331 @@ class InstallationProgressDialog(QDialog):
         self.status_label.setText(message)
         QApplication.processEvents()
 
-class ThemeCard(QFrame):
-    _active_fetchers = []
-    def __init__(self, theme: Theme, parent=None):
+class ThemeListModel(QAbstractListModel):
+    """
+    List model over the themes shown in the home grid.
+
+    Covers are only fetched for the rows the view asks for via update_fetch_window,
+    and are kept in the shared image cache so filtering the list or coming back to
+    it never downloads or decodes them again. A cover that failed is asked for
+    again after COVER_RETRY_INTERVAL, or when set_themes replaces the list.
+    """
+    ThemeRole = Qt.ItemDataRole.UserRole + 1
+    AuthorRole = Qt.ItemDataRole.UserRole + 2
+    CoverStateRole = Qt.ItemDataRole.UserRole + 3
+
+    COVER_LOADING = 0
+    COVER_READY = 1
+    COVER_FAILED = 2
+
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.theme = theme
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
-        self.setObjectName("ThemeCard")
-        self.setFixedSize(280, 240)
-        
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(15)
-        shadow.setColor(QColor(0, 0, 0, 80))
-        shadow.setOffset(0, 4)
-        self.setGraphicsEffect(shadow)
-
-        self.setStyleSheet("""
-            #ThemeCard {
-                background-color: #181825;
-                border: 1px solid #313244;
-                border-radius: 14px;
-            }
-            #ThemeCard:hover {
-                border: 1px solid #89b4fa;
-                background-color: #1e1e2e;
-            }
-        """)
-        
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(0)
-
-        # Image Container
-        self.image_label = QLabel("Loading image...")
-        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.image_label.setFixedSize(280, 160)
-        self.image_label.setStyleSheet("color: #6c7086; background-color: #11111b; border-top-left-radius: 14px; border-top-right-radius: 14px; border-bottom: 1px solid #313244;")
-        layout.addWidget(self.image_label)
-        
-        # Content Container
-        content = QWidget()
-        content_layout = QVBoxLayout(content)
-        content_layout.setContentsMargins(15, 12, 15, 12)
-        content_layout.setSpacing(4)
-
-        self.name_label = QLabel(self.theme.name)
-        self.name_label.setStyleSheet("color: #cdd6f4; font-size: 16px; font-weight: bold; border: none; background: transparent;")
-        content_layout.addWidget(self.name_label)
-
-        author_name = self.theme.created_by.get("name", "Unknown") if isinstance(self.theme.created_by, dict) else self.theme.created_by
-        self.author_label = QLabel(f"By: {author_name}")
-        self.author_label.setStyleSheet("color: #a6adc8; font-size: 13px; border: none; background: transparent;")
-        content_layout.addWidget(self.author_label)
-        
-        content_layout.addStretch()
-        layout.addWidget(content)
-
-        self.image_fetcher = CoverImageFetcher(self.theme.cover_image)
-        ThemeCard._active_fetchers.append(self.image_fetcher)
-        self.image_fetcher.image_loaded.connect(self.on_image_loaded)
-        self.image_fetcher.error_occurred.connect(self.on_image_error)
-        self.image_fetcher.finished.connect(lambda f=self.image_fetcher: ThemeCard._active_fetchers.remove(f) if f in ThemeCard._active_fetchers else None)
-        self.image_fetcher.start()
-
-    def on_image_loaded(self, image_data):
-        pixmap = QPixmap()
-        pixmap.loadFromData(image_data)
-        scaled_pixmap = pixmap.scaled(
-            self.image_label.size(), 
-            Qt.AspectRatioMode.KeepAspectRatioByExpanding, 
-            Qt.TransformationMode.SmoothTransformation
-        )
-        self.image_label.setPixmap(scaled_pixmap)
-        self.image_label.setText("")
-
-    def on_image_error(self, message):
-        self.image_label.setText(ERROR_NO_COVER_IMAGE)
-        self.image_label.setPixmap(QPixmap())
+        self.themes = []
+        self._rows_by_url = {}
+        # Cover URL -> time.monotonic() of its last failure
+        self._failed = {}
+        self._pending = {}
+        self.device_pixel_ratio = 1.0
+        # ShardedThemeIndex that supplies more rows when the view scrolls to the end
+        self.more = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.themes)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.more is not None and self.more.has_more()
+
+    def fetchMore(self, parent=QModelIndex()):
+        # Rows arrive later through append_themes
+        if self.canFetchMore(parent):
+            self.more.load_next()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        theme = self.themes[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return theme.name
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._cover(theme.cover_image)
+        if role == self.ThemeRole:
+            return theme
+        if role == self.AuthorRole:
+            return author_name(theme)
+        if role == self.CoverStateRole:
+            if self._cover(theme.cover_image) is not None:
+                return self.COVER_READY
+            if not theme.cover_image or theme.cover_image in self._failed:
+                return self.COVER_FAILED
+            return self.COVER_LOADING
+        return None
+
+    def set_themes(self, themes):
+        self.beginResetModel()
+        self.themes = list(themes)
+        self._rows_by_url = {}
+        self._failed.clear()
+        for row, theme in enumerate(self.themes):
+            self._rows_by_url.setdefault(theme.cover_image, []).append(row)
+        self.endResetModel()
+
+    def append_themes(self, themes):
+        """Add themes at the end without resetting the view (used while the index loads)."""
+        if not themes:
+            return
+        first = len(self.themes)
+        self.beginInsertRows(QModelIndex(), first, first + len(themes) - 1)
+        for row, theme in enumerate(themes, first):
+            self.themes.append(theme)
+            self._rows_by_url.setdefault(theme.cover_image, []).append(row)
+        self.endInsertRows()
+
+    def update_fetch_window(self, visible, lookahead):
+        """Fetch covers for rows in `visible` first, then `lookahead`; cancel the rest."""
+        wanted = {}
+        retry_before = time.monotonic() - COVER_RETRY_INTERVAL
+        for rows, priority in ((lookahead, PRIORITY_OFFSCREEN), (visible, PRIORITY_VISIBLE)):
+            for row in rows:
+                url = self.themes[row].cover_image
+                if url and self._failed.get(url, retry_before) <= retry_before and self._cover(url) is None:
+                    wanted[url] = priority
+
+        if not wanted and not self._pending:
+            return
+        pool = get_image_pool()
+        for url in list(self._pending):
+            if url not in wanted:
+                pool.cancel(self._pending.pop(url))
+        dpr = self.device_pixel_ratio
+        for url, priority in wanted.items():
+            if url in self._pending:
+                pool.reprioritize(self._pending[url], priority)
+            else:
+                if self._failed.pop(url, None) is not None:
+                    # Retrying: show it as loading again
+                    self._cover_changed(url)
+                self._pending[url] = pool.request(
+                    url,
+                    lambda image, u=url: self._on_cover_loaded(u, image, dpr),
+                    lambda message, u=url: self._on_cover_failed(u),
+                    priority,
+                    loader=lambda u: load_thumbnail(u, CARD_WIDTH, CARD_IMAGE_HEIGHT, dpr))
+
+    def cancel_fetches(self):
+        if not self._pending:
+            return
+        pool = get_image_pool()
+        for request in self._pending.values():
+            pool.cancel(request)
+        self._pending.clear()
+
+    def _cover(self, url):
+        return find_pixmap(cover_key(url, self.device_pixel_ratio)) if url else None
+
+    def _on_cover_loaded(self, url, image, device_pixel_ratio):
+        # Thumbnails arrive decoded, scaled and cropped to the card by the pool
+        self._pending.pop(url, None)
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        insert_pixmap(cover_key(url, device_pixel_ratio), pixmap)
+        self._cover_changed(url)
+
+    def _on_cover_failed(self, url):
+        self._pending.pop(url, None)
+        self._failed[url] = time.monotonic()
+        self._cover_changed(url)
+
+    def _cover_changed(self, url):
+        for row in self._rows_by_url.get(url, []):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole, self.CoverStateRole])
+
+
+class ThemeCardDelegate(QStyledItemDelegate):
+    """Paints a theme card directly instead of building a widget per theme."""
+
+    RADIUS = 14
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.name_font = QFont()
+        self.name_font.setPixelSize(16)
+        self.name_font.setBold(True)
+        self.author_font = QFont()
+        self.author_font.setPixelSize(13)
+        self.placeholder_font = QFont()
+        self.placeholder_font.setPixelSize(13)
+
+    def sizeHint(self, option, index):
+        return QSize(CARD_WIDTH, CARD_HEIGHT)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        card = QRectF(0, 0, CARD_WIDTH, CARD_HEIGHT)
+        card.moveCenter(QRectF(option.rect).center())
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+
+        # Soft drop shadow
+        painter.setPen(Qt.PenStyle.NoPen)
+        for spread, alpha in ((6, 12), (4, 18), (2, 26)):
+            painter.setBrush(QColor(0, 0, 0, alpha))
+            painter.drawRoundedRect(card.adjusted(-spread, -spread + 4, spread, spread + 4),
+                                    self.RADIUS + spread, self.RADIUS + spread)
+
+        outline = QPainterPath()
+        outline.addRoundedRect(card, self.RADIUS, self.RADIUS)
+        painter.fillPath(outline, QColor("#1e1e2e" if hovered else "#181825"))
+
+        # Cover image, clipped to the rounded top of the card
+        image_rect = QRectF(card.left(), card.top(), CARD_WIDTH, CARD_IMAGE_HEIGHT)
+        painter.save()
+        painter.setClipPath(outline)
+        painter.fillRect(image_rect, QColor("#11111b"))
+        pixmap = index.data(Qt.ItemDataRole.DecorationRole)
+        if pixmap is not None:
+            painter.drawPixmap(image_rect.toRect(), pixmap)
+        else:
+            state = index.data(ThemeListModel.CoverStateRole)
+            painter.setFont(self.placeholder_font)
+            painter.setPen(QColor("#6c7086"))
+            text = ERROR_NO_COVER_IMAGE if state == ThemeListModel.COVER_FAILED else "Loading image..."
+            painter.drawText(image_rect, Qt.AlignmentFlag.AlignCenter, text)
+        painter.restore()
+
+        painter.setPen(QColor("#313244"))
+        painter.drawLine(image_rect.bottomLeft(), image_rect.bottomRight())
+
+        # Name and author
+        text_rect = QRectF(card.left() + 15, image_rect.bottom() + 12, CARD_WIDTH - 30, 22)
+        painter.setFont(self.name_font)
+        painter.setPen(QColor("#cdd6f4"))
+        name = QFontMetrics(self.name_font).elidedText(
+            index.data(Qt.ItemDataRole.DisplayRole) or "", Qt.TextElideMode.ElideRight, int(text_rect.width()))
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, name)
+
+        text_rect.translate(0, 26)
+        painter.setFont(self.author_font)
+        painter.setPen(QColor("#a6adc8"))
+        author = QFontMetrics(self.author_font).elidedText(
+            f"By: {index.data(ThemeListModel.AuthorRole)}", Qt.TextElideMode.ElideRight, int(text_rect.width()))
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, author)
+
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.setPen(QPen(QColor("#89b4fa" if hovered else "#313244"), 1))
+        painter.drawRoundedRect(card.adjusted(0.5, 0.5, -0.5, -0.5), self.RADIUS, self.RADIUS)
+        painter.restore()
+
+
+class ThemeGridView(QListView):
+    """
+    Virtualized, centred grid of theme cards.
+
+    Only the cards inside the viewport are painted, and only their covers (plus
+    the next screen) are fetched.
+    """
+    theme_clicked = pyqtSignal(object)
+    theme_hovered = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setMovement(QListView.Movement.Static)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setUniformItemSizes(True)
+        self.setGridSize(QSize(CARD_WIDTH + CARD_SPACING, CARD_HEIGHT + CARD_SPACING))
+        self.setSelectionMode(QListView.SelectionMode.NoSelection)
+        self.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setMouseTracking(True)
+        self.viewport().setCursor(Qt.CursorShape.PointingHandCursor)
+        self.setStyleSheet("QListView { background-color: transparent; border: none; }")
+        self.setItemDelegate(ThemeCardDelegate(self))
+
+        self.verticalScrollBar().valueChanged.connect(self.update_fetch_window)
+        self.clicked.connect(lambda index: self.theme_clicked.emit(index.data(ThemeListModel.ThemeRole)))
+        self.entered.connect(lambda index: self.theme_hovered.emit(index.data(ThemeListModel.ThemeRole)))
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.modelReset.connect(self.update_fetch_window)
+        model.rowsInserted.connect(self.update_fetch_window)
+
+    def columns(self):
+        return max(1, (self.width() - 20) // self.gridSize().width())
+
+    def resizeEvent(self, event):
+        # Squeeze the grid block into the exact center of the view
+        side = max(0, (self.width() - self.columns() * self.gridSize().width()) // 2)
+        if self.viewportMargins().left() != side:
+            self.setViewportMargins(side, 10, side, 10)
+        super().resizeEvent(event)
+        self.update_fetch_window()
+
+    def _row_span(self):
+        # (first, last) grid rows intersecting the viewport, plus rows per screen
+        row_height = self.gridSize().height()
+        top = self.verticalScrollBar().value()
+        height = max(self.viewport().height(), row_height)
+        return max(0, top // row_height), (top + height) // row_height, height // row_height + 1
+
+    def visible_rows(self):
+        """Return the range of model rows currently on screen."""
+        model = self.model()
+        if model is None:
+            return range(0)
+        first_row, last_row, _ = self._row_span()
+        columns = self.columns()
+        return range(first_row * columns, min(model.rowCount(), (last_row + 1) * columns))
+
+    def update_fetch_window(self):
+        """Tell the model which rows are on screen and which come right after."""
+        model = self.model()
+        if model is None:
+            return
+        first_row, last_row, lookahead = self._row_span()
+        columns = self.columns()
+        wanted = (last_row + 1 + lookahead) * columns
+
+        if model.rowCount() > 0:
+            model.device_pixel_ratio = self.devicePixelRatioF()
+            lookahead_rows = range(max(0, (first_row - lookahead) * columns), min(model.rowCount(), wanted))
+            model.update_fetch_window(self.visible_rows(), lookahead_rows)
+        # The next screen runs past the loaded rows of a sharded index
+        if wanted > model.rowCount() and model.canFetchMore(QModelIndex()):
+            model.fetchMore(QModelIndex())
+
 
 class ImageCarousel(QWidget):
+    """
+    Preview screenshots for one theme.
+
+    Only the current slide and its neighbours are decoded, already scaled to the
+    slide area; slides that fall out of that window are released, so memory use
+    does not grow with the number of screenshots.
+    """
+    WINDOW = 1
+    SLIDE_STYLE = "border-radius: 12px; background-color: #11111b; border: 1px solid #313244;"
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.current_images = []
+        self.image_urls = []
         self.current_image_index = 0
+        self._slides = {}
+        self._requests = {}
+        self._failed = set()
+        self._slide_size = None
         self.setup_ui()
+
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(100)
+        self._resize_timer.timeout.connect(self._on_resized)
     
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -135,9 +380,12 @@ class ImageCarousel(QWidget):
         nav_layout.setContentsMargins(0, 0, 0, 0)
         nav_layout.setSpacing(15)
 
-        self.carousel_widget = QStackedWidget()
-        self.carousel_widget.setMinimumSize(800, 450)
-        self.carousel_widget.setStyleSheet("border-radius: 12px; background-color: #11111b; border: 1px solid #313244;")
+        self.slide_label = QLabel()
+        self.slide_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.slide_label.setMinimumSize(800, 450)
+        # Let the layout size the slide; the pixmap is scaled to fit, never the other way round
+        self.slide_label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.slide_label.setStyleSheet(self.SLIDE_STYLE)
         
         btn_style = """
             QPushButton { background-color: #313244; border: none; border-radius: 20px; font-size: 18px; color: #cdd6f4; min-width: 40px; min-height: 40px; }
@@ -156,7 +404,7 @@ class ImageCarousel(QWidget):
         self.next_button.clicked.connect(self.next_image)
         
         nav_layout.addWidget(self.prev_button, alignment=Qt.AlignmentFlag.AlignVCenter)
-        nav_layout.addWidget(self.carousel_widget, 1) 
+        nav_layout.addWidget(self.slide_label, 1) 
         nav_layout.addWidget(self.next_button, alignment=Qt.AlignmentFlag.AlignVCenter)
         
         main_layout.addLayout(nav_layout, 1)
@@ -166,56 +414,132 @@ class ImageCarousel(QWidget):
         self.image_counter.setStyleSheet("font-size: 14px; color: #a6adc8; padding-top: 10px;")
         main_layout.addWidget(self.image_counter)
 
-    def load_images(self, images_data):
+    def target_size(self):
+        """Return (width, height, device pixel ratio) images should be scaled to."""
+        size = self.slide_label.size()
+        return size.width(), size.height(), self.devicePixelRatioF()
+
+    def load_urls(self, image_urls):
+        """Show a theme's screenshots, starting with the first one."""
         self.clear_carousel()
-        pixmaps = []
-        for data in (images_data or []):
-            p = QPixmap()
-            p.loadFromData(data)
-            if not p.isNull(): pixmaps.append(p)
-            
-        if not pixmaps:
+        self.image_urls = list(image_urls or [])
+        if not self.image_urls:
             self.show_error_message("No images available.")
             return
-            
-        for pixmap in pixmaps:
-            scaled = pixmap.scaled(self.carousel_widget.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            label = QLabel()
-            label.setPixmap(scaled)
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.carousel_widget.addWidget(label)
-        
-        self.current_images = pixmaps
-        self.current_image_index = 0
+        self._slide_size = self.target_size()
+        self._update_window()
+        self._show_current()
         self.update_navigation()
-        self.carousel_widget.setCurrentIndex(0)
+
+    def _update_window(self):
+        """Load the current slide and its neighbours, release everything else."""
+        first = max(0, self.current_image_index - self.WINDOW)
+        last = min(len(self.image_urls) - 1, self.current_image_index + self.WINDOW)
+        window = range(first, last + 1)
+
+        pool = get_image_pool()
+        for index in list(self._requests):
+            if index not in window:
+                pool.cancel(self._requests.pop(index))
+        for index in list(self._slides):
+            if index not in window:
+                del self._slides[index]
+
+        width, height, dpr = self._slide_size
+        for index in window:
+            if index in self._slides or index in self._failed:
+                continue
+            priority = PRIORITY_PREVIEW if index == self.current_image_index else PRIORITY_PREVIEW + 1
+            if index in self._requests:
+                pool.reprioritize(self._requests[index], priority)
+                continue
+            url = self.image_urls[index]
+            # Revisited slides are shown straight from memory
+            pixmap = find_pixmap(carousel_key(url, width, height, dpr)) if url else None
+            if pixmap is not None:
+                self._slides[index] = pixmap
+                continue
+            self._requests[index] = pool.request(
+                url,
+                lambda image, i=index, u=url: self._on_image_loaded(i, u, image, width, height, dpr),
+                lambda message, i=index: self._on_image_error(i),
+                priority,
+                loader=lambda u: load_scaled_image(u, width, height, dpr))
+
+    def _show_current(self):
+        index = self.current_image_index
+        if index in self._slides:
+            self.slide_label.setStyleSheet(self.SLIDE_STYLE)
+            self.slide_label.setPixmap(self._slides[index])
+        elif index in self._failed:
+            self._show_text(ERROR_NO_COVER_IMAGE, "font-size: 14px; color: #f38ba8;")
+        else:
+            self._show_text("Loading image...", "font-size: 16px; color: #a6adc8;")
+
+    def _show_text(self, text, style):
+        self.slide_label.setStyleSheet(f"{self.SLIDE_STYLE} {style}")
+        self.slide_label.setText(text)
+
+    def _on_image_loaded(self, index, url, image, width, height, dpr):
+        self._requests.pop(index, None)
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(dpr)
+        insert_pixmap(carousel_key(url, width, height, dpr), pixmap)
+        self._slides[index] = pixmap
+        if index == self.current_image_index:
+            self._show_current()
+
+    def _on_image_error(self, index):
+        self._requests.pop(index, None)
+        self._failed.add(index)
+        if index == self.current_image_index:
+            self._show_current()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.image_urls:
+            self._resize_timer.start()
+
+    def _on_resized(self):
+        size = self.target_size()
+        if not self.image_urls or size == self._slide_size:
+            return
+        # Re-request the window at the new size; the old pixmap stays up until it arrives
+        self._slide_size = size
+        self._cancel_requests()
+        self._slides.clear()
+        self._update_window()
+        if self.current_image_index in self._slides:
+            self._show_current()
     
     def show_loading(self):
         self.clear_carousel()
-        lbl = QLabel("Loading images...")
-        lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        lbl.setStyleSheet("font-size: 16px; color: #a6adc8;")
-        self.carousel_widget.addWidget(lbl)
+        self._show_text("Loading images...", "font-size: 16px; color: #a6adc8;")
         self.update_navigation()
     
     def show_error_message(self, message):
         self.clear_carousel()
-        lbl = QLabel(message)
-        lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        lbl.setStyleSheet("font-size: 14px; color: #f38ba8;")
-        self.carousel_widget.addWidget(lbl)
+        self._show_text(message, "font-size: 14px; color: #f38ba8;")
         self.update_navigation()
+
+    def _cancel_requests(self):
+        if not self._requests:
+            return
+        pool = get_image_pool()
+        for request in self._requests.values():
+            pool.cancel(request)
+        self._requests = {}
     
     def clear_carousel(self):
-        while self.carousel_widget.count() > 0:
-            w = self.carousel_widget.widget(0)
-            self.carousel_widget.removeWidget(w)
-            w.deleteLater()
-        self.current_images = []
+        self._cancel_requests()
+        self._slides = {}
+        self._failed = set()
+        self.image_urls = []
         self.current_image_index = 0
+        self.slide_label.clear()
     
     def update_navigation(self):
-        total = len(self.current_images)
+        total = len(self.image_urls)
         if total <= 1:
             self.prev_button.setEnabled(False)
             self.next_button.setEnabled(False)
@@ -224,15 +548,17 @@ class ImageCarousel(QWidget):
             self.prev_button.setEnabled(self.current_image_index > 0)
             self.next_button.setEnabled(self.current_image_index < total - 1)
             self.image_counter.setText(f"{self.current_image_index + 1} / {total}")
+
+    def _go_to(self, index):
+        self.current_image_index = index
+        self._update_window()
+        self._show_current()
+        self.update_navigation()
             
     def previous_image(self):
         if self.current_image_index > 0:
-            self.current_image_index -= 1
-            self.carousel_widget.setCurrentIndex(self.current_image_index)
-            self.update_navigation()
+            self._go_to(self.current_image_index - 1)
             
     def next_image(self):
-        if self.current_image_index < len(self.current_images) - 1:
-            self.current_image_index += 1
-            self.carousel_widget.setCurrentIndex(self.current_image_index)
-            self.update_navigation()
+        if self.current_image_index < len(self.image_urls) - 1:
+            self._go_to(self.current_image_index + 1)